@@ -1,35 +1,54 @@
 import os
+import re
 import json
+import asyncio
 import hashlib
 import streamlit as st
-from streamlit_authenticator.utilities.exceptions import LoginError
 
-from src.text_loader import extract_text
-from src.llm_client import GroqLLM, GeminiLLM
-from src.analyzer import analyze_contract
-from src.calendar import make_ics_from_dates, make_google_links_from_dates, make_outlook_links_from_dates
-from src.rag import retrieve_relevant_chunks
-from src.auth import init_authenticator
-from src.export_pdf import generate_pdf_analysis
+# orjson serializa em C, bem mais rápido que o json da stdlib; opcional
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+
+def _json_dumps(obj) -> str:
+    """Serializa para JSON legível (UTF-8), usando orjson quando disponível."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+# Módulos pesados (SDKs de IA, sklearn, reportlab, pypdf/docx, authenticator)
+# são importados dentro das funções que os usam: o primeiro paint da página
+# não paga o custo de importar tudo, e sys.modules amortiza os usos seguintes.
 
 
 st.set_page_config(page_title="Analisador de Contratos (IA)", layout="wide")
 
+# Rótulos das seções de resultado (tupla constante: não é reconstruída por rerun)
+TAB_LABELS = (
+    "Resumo",
+    "Datas de vencimento",
+    "Valores e Multas",
+    "Partes envolvidas",
+    "Cláusulas comprometedoras",
+    "Cláusulas padrão e desvios",
+    "Análise de risco",
+    "Resumo jurídico",
+)
+
 
 def sidebar_config():
     st.sidebar.header("Configurações")
     provider = st.sidebar.selectbox("Provedor de IA", ["Groq", "Gemini"], index=0)
 
     if provider == "Groq":
-        api_key = st.sidebar.text_input(
-            "GROQ API Key",
-            value=os.environ.get("GROQ_API_KEY", ""),
-            type="password",
-            help=(
-                "Informe sua chave de API da Groq. Você também pode definir a variável"
-                " de ambiente `GROQ_API_KEY`. A chave não é armazenada pelo app;"
-                " é lida apenas localmente."
-            ),
+        key_label = "GROQ API Key"
+        key_default = os.environ.get("GROQ_API_KEY", "")
+        key_help = (
+            "Informe sua chave de API da Groq. Você também pode definir a variável"
+            " de ambiente `GROQ_API_KEY`. A chave não é armazenada pelo app;"
+            " é lida apenas localmente."
         )
         options_models = [
             "llama-3.1-8b-instant",
@@ -42,15 +61,12 @@ def sidebar_config():
             "foram descontinuados. Veja mais em https://console.groq.com/docs/deprecations."
         )
     else:
-        api_key = st.sidebar.text_input(
-            "Gemini API Key",
-            value=os.environ.get("GEMINI_API_KEY", ""),
-            type="password",
-            help=(
-                "Informe sua chave de API do Gemini (Google). Você também pode definir a variável"
-                " de ambiente `GEMINI_API_KEY`. A chave não é armazenada pelo app;"
-                " é lida apenas localmente."
-            ),
+        key_label = "Gemini API Key"
+        key_default = os.environ.get("GEMINI_API_KEY", "")
+        key_help = (
+            "Informe sua chave de API do Gemini (Google). Você também pode definir a variável"
+            " de ambiente `GEMINI_API_KEY`. A chave não é armazenada pelo app;"
+            " é lida apenas localmente."
         )
         options_models = [
             "gemini-2.5-flash",
@@ -75,45 +91,181 @@ def sidebar_config():
             "Modelos Gemini disponíveis. Alguns são voltados a TTS/Imagem — para análise textual, o app tenta fallback automático para um modelo de texto compatível."
         )
 
-    model = st.sidebar.selectbox(
-        "Modelo LLM",
-        options=options_models,
-        index=(options_models.index(default_model) if default_model in options_models else 0),
-        help=model_help,
-    )
-    temperature = st.sidebar.slider(
-        "Temperatura",
-        0.0,
-        1.0,
-        0.2,
-        0.05,
-        help=(
-            "Controla a criatividade/variação das respostas. Valores baixos (0.0–0.3)"
-            " geram respostas mais objetivas e estáveis. Valores altos (≥0.7)"
-            " tornam as respostas mais criativas e menos determinísticas."
-        ),
-    )
-    max_output_tokens = st.sidebar.slider(
-        "Máx. tokens de saída",
-        200,
-        4096,
-        2000,
-        50,
-        help=(
-            "Limite de tokens na resposta gerada. Reduza se encontrar limites do provedor."
-        ),
+    # Form: mudar chave/modelo/sliders só dispara um rerun ao clicar em "Aplicar",
+    # em vez de reexecutar o script inteiro a cada ajuste de slider
+    with st.sidebar.form("config"):
+        api_key = st.text_input(key_label, value=key_default, type="password", help=key_help)
+        model = st.selectbox(
+            "Modelo LLM",
+            options=options_models,
+            index=(options_models.index(default_model) if default_model in options_models else 0),
+            help=model_help,
+        )
+        temperature = st.slider(
+            "Temperatura",
+            0.0,
+            1.0,
+            0.2,
+            0.05,
+            help=(
+                "Controla a criatividade/variação das respostas. Valores baixos (0.0–0.3)"
+                " geram respostas mais objetivas e estáveis. Valores altos (≥0.7)"
+                " tornam as respostas mais criativas e menos determinísticas."
+            ),
+        )
+        max_output_tokens = st.slider(
+            "Máx. tokens de saída",
+            200,
+            4096,
+            2000,
+            50,
+            help=(
+                "Limite de tokens na resposta gerada. Reduza se encontrar limites do provedor."
+            ),
+        )
+        max_chunks = st.slider(
+            "Máx. chunks para textos longos",
+            4,
+            24,
+            12,
+            1,
+            help=(
+                "Para contratos muito grandes, limita quantos trechos serão analisados para evitar limites."
+            ),
+        )
+        st.form_submit_button("Aplicar")
+
+    return provider, api_key, model, temperature, max_output_tokens, max_chunks
+
+
+@st.cache_resource(show_spinner=False)
+def _get_rag_index(text_id: str, _text: str):
+    """Índice TF-IDF construído uma vez por contrato e reutilizado entre perguntas.
+
+    A chave é o id do texto; perguntas subsequentes pagam só a vetorização da
+    query, não o re-chunking e o fit da matriz inteira.
+    """
+    from src.rag import build_index
+
+    return build_index(_text)
+
+
+@st.cache_data(show_spinner=False)
+def _build_pdf(results: dict, resumo_por_clausulas, resumo_detalhado) -> bytes:
+    """Gera (e cacheia) o PDF da análise; só roda quando o usuário pede."""
+    from src.export_pdf import generate_pdf_analysis
+
+    return generate_pdf_analysis(
+        results,
+        resumo_por_clausulas=resumo_por_clausulas,
+        resumo_detalhado=resumo_detalhado,
     )
-    max_chunks = st.sidebar.slider(
-        "Máx. chunks para textos longos",
-        4,
-        24,
-        12,
-        1,
-        help=(
-            "Para contratos muito grandes, limita quantos trechos serão analisados para evitar limites."
-        ),
+
+
+@st.cache_data(show_spinner=False)
+def _retrieve_cached(text_id: str, question: str, top_k: int, _text: str):
+    """Memoiza a recuperação de trechos por (contrato, pergunta, top_k).
+
+    O text_id discrimina a chave para que o Streamlit não precise re-hashear
+    o texto inteiro do contrato a cada chamada.
+    """
+    from src.rag import search as rag_search
+
+    return rag_search(_get_rag_index(text_id, _text), question, top_k=top_k)
+
+
+@st.cache_data(show_spinner=False)
+def _results_dataframes(results: dict):
+    """Converte as listas do resultado em DataFrames uma única vez.
+
+    st.dataframe sobre lista de dicts refaz a inferência do pandas a cada
+    rerun; com o DataFrame pronto e cacheado, a serialização Arrow é direta.
+    """
+    import pandas as pd
+
+    return {k: pd.DataFrame(v) for k, v in results.items() if isinstance(v, list) and v}
+
+
+@st.cache_resource(show_spinner=False)
+def _get_authenticator():
+    """Constrói o autenticador uma única vez.
+
+    init_authenticator() re-hasheia as senhas de fallback (bcrypt é caro por
+    design); sem cache isso rodava em todo rerun, antes mesmo do login.
+    """
+    from src.auth import init_authenticator
+
+    return init_authenticator()
+
+
+@st.cache_resource(show_spinner=False)
+def _get_semantic_cache():
+    """Cache persistente (sqlite) de respostas de IA, compartilhado entre sessões."""
+    from src.semantic_cache import SemanticCache
+
+    return SemanticCache()
+
+
+@st.cache_resource(show_spinner=False)
+def _get_llm_cached(provider: str, api_key_fp: str, _api_key: str):
+    """Reutiliza o cliente LLM entre reruns.
+
+    Construir o cliente a cada rerun descarta o pool de conexões e força novo
+    handshake TCP/TLS na próxima chamada; cacheado, o socket persiste.
+    A identidade do cache é (provedor, fingerprint): a chave em si entra com
+    prefixo `_` para que o Streamlit não a incorpore à chave do cache.
+    """
+    from src.llm_client import GroqLLM, GeminiLLM
+
+    return GroqLLM(api_key=_api_key) if provider == "Groq" else GeminiLLM(api_key=_api_key)
+
+
+def _get_llm(provider: str, api_key: str):
+    fp = hashlib.blake2b(api_key.encode("utf-8"), digest_size=8).hexdigest()
+    return _get_llm_cached(provider, fp, api_key)
+
+
+@st.cache_data(show_spinner=False)
+def _cached_analyze_contract(
+    text_id: str,
+    provider: str,
+    model: str,
+    temperature: float,
+    max_output_tokens: int,
+    max_chunks: int,
+    _text: str,
+    _llm,
+    _progress_hook=None,
+):
+    """Cacheia o resultado da análise por (contrato, provedor, parâmetros).
+
+    Reenviar o mesmo contrato com os mesmos parâmetros devolve o resultado
+    salvo sem nenhuma chamada à IA. Argumentos com '_' não entram na chave.
+    """
+    from src.analyzer import analyze_contract, analyze_contract_async
+    from src.llm_client import GroqLLM
+
+    if isinstance(_llm, GroqLLM):
+        return asyncio.run(
+            analyze_contract_async(
+                _text,
+                _llm,
+                model=model,
+                temperature=temperature,
+                max_output_tokens=max_output_tokens,
+                max_chunks=max_chunks,
+                progress_hook=_progress_hook,
+            )
+        )
+    return analyze_contract(
+        _text,
+        _llm,
+        model=model,
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+        max_chunks=max_chunks,
+        progress_hook=_progress_hook,
     )
-    return provider, api_key, model, temperature, max_output_tokens, max_chunks
 
 
 def render_header():
@@ -123,18 +275,51 @@ def render_header():
     )
 
 
+@st.cache_data(show_spinner=False)
+def _cached_extract_text(file_bytes: bytes, name: str) -> str:
+    """Extrai e cacheia o texto pelo conteúdo do arquivo.
+
+    O parsing de PDF/DOCX é determinístico e caro; com a chave derivada dos
+    bytes, reruns com o mesmo upload não reparseiam nada.
+    """
+    from src.text_loader import extract_text_from_pdf, extract_text_from_docx
+
+    lowered = name.lower()
+    if lowered.endswith(".pdf"):
+        return extract_text_from_pdf(file_bytes)
+    if lowered.endswith(".docx"):
+        return extract_text_from_docx(file_bytes)
+    raise ValueError("Formato não suportado. Envie PDF ou DOCX.")
+
+
 def render_upload_and_preview():
     uploaded = st.file_uploader("Envie o contrato (PDF ou DOCX)", type=["pdf", "docx"], accept_multiple_files=False)
     if uploaded:
         try:
-            text = extract_text(uploaded)
+            text = _cached_extract_text(uploaded.getvalue(), uploaded.name)
         except Exception as e:
             st.error(f"Falha ao extrair texto: {e}")
             return None
 
         st.success("Arquivo carregado e texto extraído com sucesso.")
+        # Fingerprint calculado uma vez por upload: reruns com o mesmo arquivo
+        # nem tocam no hash (o file_id do Streamlit identifica o upload)
+        file_key = getattr(uploaded, "file_id", None) or f"{uploaded.name}:{uploaded.size}"
+        tid_key = f"text_id::{file_key}"
+        text_id = st.session_state.get(tid_key)
+        if text_id is None:
+            text_id = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+            st.session_state[tid_key] = text_id
+        st.session_state["current_text_id"] = text_id
+
+        # Pré-visualização construída uma vez por upload e reutilizada nos reruns
+        preview_key = f"preview::{uploaded.name}:{len(text)}"
+        preview = st.session_state.get(preview_key)
+        if preview is None:
+            preview = text[:4000] + ("\n..." if len(text) > 4000 else "")
+            st.session_state[preview_key] = preview
         with st.expander("Pré-visualização do texto extraído (parcial)", expanded=False):
-            st.text(text[:4000] + ("\n..." if len(text) > 4000 else ""))
+            st.text(preview)
         return text
     return None
 
@@ -145,10 +330,11 @@ def _metric(value, label):
         st.metric(label=label, value=value)
 
 
+@st.fragment
 def render_analysis_sections(
     results: dict,
     text: str,
-    llm: GroqLLM,
+    llm,
     model: str,
     temperature: float,
     max_output_tokens: int,
@@ -157,23 +343,13 @@ def render_analysis_sections(
         st.info("Nenhum resultado para exibir.")
         return
 
-    # Persistir a aba ativa durante reruns
-    tab_labels = [
-        "Resumo",
-        "Datas de vencimento",
-        "Valores e Multas",
-        "Partes envolvidas",
-        "Cláusulas comprometedoras",
-        "Cláusulas padrão e desvios",
-        "Análise de risco",
-        "Resumo jurídico",
-    ]
-    active_tab = st.session_state.get("active_tab", tab_labels[0])
-    ordered_labels = [active_tab] + [l for l in tab_labels if l != active_tab]
-    tabs_list = st.tabs(ordered_labels)
-    tabs_by_label = {label: tabs_list[i] for i, label in enumerate(ordered_labels)}
+    # Seletor estável de seção: só a seção ativa é renderizada por rerun,
+    # em vez de recriar 8 abas (e 8 dataframes) a cada interação. Como a
+    # função é um fragment, trocar de seção reexecuta só este bloco.
+    selected = st.radio("Seção", TAB_LABELS, horizontal=True, key="active_tab", label_visibility="collapsed")
+    dfs = _results_dataframes(results)
 
-    with tabs_by_label["Resumo"]:
+    if selected == "Resumo":
         st.subheader("Resumo da análise")
         datas = results.get("datas_vencimento", [])
         valores = results.get("valores_multas", [])
@@ -207,16 +383,18 @@ def render_analysis_sections(
 
         st.divider()
         st.subheader("Exportar análise completa")
-        resumo_por_clausulas = st.session_state.get("resumo_por_clausulas")
-        pdf_bytes = None
-        try:
-            pdf_bytes = generate_pdf_analysis(
-                results,
-                resumo_por_clausulas=resumo_por_clausulas,
-                resumo_detalhado=st.session_state.get("resumo_detalhado"),
-            )
-        except Exception as e:
-            st.warning(f"Falha ao preparar PDF: {e}")
+        # PDF gerado sob demanda: renderizar o Resumo não paga mais o ReportLab
+        if st.button("Preparar PDF", key="btn_preparar_pdf"):
+            try:
+                st.session_state["pdf_bytes"] = _build_pdf(
+                    results,
+                    st.session_state.get("resumo_por_clausulas"),
+                    st.session_state.get("resumo_detalhado"),
+                )
+            except Exception as e:
+                st.session_state.pop("pdf_bytes", None)
+                st.warning(f"Falha ao preparar PDF: {e}")
+        pdf_bytes = st.session_state.get("pdf_bytes")
         st.download_button(
             label="Baixar análise completa (PDF)",
             data=pdf_bytes or b"",
@@ -225,13 +403,13 @@ def render_analysis_sections(
             disabled=pdf_bytes is None,
         )
 
-    with tabs_by_label["Datas de vencimento"]:
+    if selected == "Datas de vencimento":
         st.subheader("Datas de vencimento")
         datas = results.get("datas_vencimento", [])
         if not datas:
             st.write("Nenhuma data encontrada.")
         else:
-            st.dataframe(datas, width='stretch')
+            st.dataframe(dfs["datas_vencimento"], width='stretch')
 
             st.divider()
             st.subheader("Exportar para calendário")
@@ -241,42 +419,31 @@ def render_analysis_sections(
 
             validas = [d for d in datas if d.get("data_iso")] if not incluir_sem_data else datas
             if st.button("Gerar links e arquivo ICS", disabled=len(validas) == 0):
-                # Garantir que após o rerun continue nesta aba
-                st.session_state["active_tab"] = "Datas de vencimento"
                 with st.spinner("Gerando links e arquivo ICS..."):
-                    links = make_google_links_from_dates(validas, titulo_base=titulo_base, detalhes=detalhes)
-                    outlook_links = make_outlook_links_from_dates(validas, titulo_base=titulo_base, detalhes=detalhes)
-                    ics_content = make_ics_from_dates(validas, titulo_base=titulo_base, detalhes=detalhes)
+                    from src.calendar import build_calendar_artifacts
+
+                    # Uma passada só gera links Google/Outlook e o ICS, sem remontar mapas por chave
+                    rows, ics_content = build_calendar_artifacts(validas, titulo_base=titulo_base, detalhes=detalhes)
                     st.success("Links e arquivo ICS gerados.")
                     st.markdown("**Links de calendário (Google + Outlook)**")
 
-                    # Mapear por descrição para montar linhas combinadas
-                    def _key(desc: str, date_iso: str) -> str:
-                        return f"{(desc or '').strip()}|{(date_iso or '').strip()}"
-
-                    g_map = {_key(i.get("descricao"), i.get("date_iso")): i.get("link") for i in links}
-                    o_map = {
-                        _key(i.get("descricao"), i.get("date_iso")): {"live": i.get("live"), "office": i.get("office")}
-                        for i in outlook_links
-                    }
-
-                    for v in validas:
-                        desc = v.get("descricao") or v.get("data_iso") or "Data de vencimento"
-                        key = _key(v.get("descricao"), v.get("data_iso"))
-                        g = g_map.get(key)
-                        o = o_map.get(key, {})
-                        live = o.get("live")
-                        office = o.get("office")
+                    # Um único st.markdown: cada chamada é uma ida-e-volta de
+                    # protobuf ao frontend, então N linhas viram 1 mensagem
+                    lines = []
+                    for row in rows:
+                        desc = row.get("descricao") or "Data de vencimento"
                         parts = []
-                        if live:
-                            parts.append(f"[Outlook.com]({live})")
-                        if office:
-                            parts.append(f"[Outlook365.com]({office})")
-                        if g:
-                            parts.append(f"[Agenda.com]({g})")
+                        if row.get("live"):
+                            parts.append(f"[Outlook.com]({row['live']})")
+                        if row.get("office"):
+                            parts.append(f"[Outlook365.com]({row['office']})")
+                        if row.get("google"):
+                            parts.append(f"[Agenda.com]({row['google']})")
                         # Se algum link estiver ausente, ainda mostramos os disponíveis
                         if parts:
-                            st.markdown(f"- {desc}: " + " | ".join(parts))
+                            lines.append(f"- {desc}: " + " | ".join(parts))
+                    if lines:
+                        st.markdown("\n".join(lines))
                     st.download_button(
                         label="Baixar arquivo .ics",
                         data=ics_content,
@@ -284,40 +451,39 @@ def render_analysis_sections(
                         mime="text/calendar",
                     )
 
-    with tabs_by_label["Valores e Multas"]:
+    if selected == "Valores e Multas":
         st.subheader("Valores e Multas")
         valores = results.get("valores_multas", [])
         if valores:
-            valores_sem_moeda = [{k: v for k, v in it.items() if k != "moeda"} for it in valores]
-            st.dataframe(valores_sem_moeda, width='stretch')
+            st.dataframe(dfs["valores_multas"].drop(columns=["moeda"], errors="ignore"), width='stretch')
         else:
             st.write("Nenhum valor/multa encontrado.")
 
-    with tabs_by_label["Partes envolvidas"]:
+    if selected == "Partes envolvidas":
         st.subheader("Partes envolvidas")
         partes = results.get("partes", [])
         if partes:
-            st.dataframe(partes, width='stretch')
+            st.dataframe(dfs["partes"], width='stretch')
         else:
             st.write("Partes não identificadas claramente.")
 
-    with tabs_by_label["Cláusulas comprometedoras"]:
+    if selected == "Cláusulas comprometedoras":
         st.subheader("Cláusulas que podem comprometer as partes")
         comp = results.get("clausulas_comprometedoras", [])
         if comp:
-            st.dataframe(comp, width='stretch')
+            st.dataframe(dfs["clausulas_comprometedoras"], width='stretch')
         else:
             st.write("Nenhuma cláusula potencialmente comprometedora destacada.")
 
-    with tabs_by_label["Cláusulas padrão e desvios"]:
+    if selected == "Cláusulas padrão e desvios":
         st.subheader("Cláusulas padrão e desvios")
         padrao = results.get("clausulas_padrao", [])
         if padrao:
-            st.dataframe(padrao, width='stretch')
+            st.dataframe(dfs["clausulas_padrao"], width='stretch')
         else:
             st.write("Nenhuma cláusula padrão encontrada ou analisada.")
 
-    with tabs_by_label["Análise de risco"]:
+    if selected == "Análise de risco":
         st.subheader("Análise de risco")
         risco = results.get("analise_risco", {})
         if risco:
@@ -335,7 +501,7 @@ def render_analysis_sections(
         else:
             st.write("Análise de risco não disponível.")
 
-    with tabs_by_label["Resumo jurídico"]:
+    if selected == "Resumo jurídico":
         st.subheader("Resumo jurídico")
         resumo = results.get("resumo_juridico", "")
         if resumo:
@@ -346,7 +512,6 @@ def render_analysis_sections(
         st.divider()
         st.markdown("**Resumo detalhado (opcional)**")
         if st.button("Gerar resumo detalhado", key="btn_resumo_detalhado", disabled=not bool(text)):
-            st.session_state["active_tab"] = "Resumo jurídico"
             with st.spinner("Gerando resumo detalhado com IA..."):
                 try:
                     # Montar prompt para resumo detalhado priorizando trechos relevantes para reduzir tokens
@@ -356,25 +521,41 @@ def render_analysis_sections(
                         "mecanismos de rescisão, garantias, foro, riscos relevantes e pontos de atenção. Evite linguagem excessivamente técnica."
                     )
                     try:
-                        top_chunks = retrieve_relevant_chunks("Resumo detalhado do contrato", text, top_k=6)
+                        top_chunks = _retrieve_cached(
+                            st.session_state.get("last_text_id", ""), "Resumo detalhado do contrato", 6, text
+                        )
                         context = "\n\n".join(top_chunks)
                     except Exception:
                         context = (text or "")[:6000]
                     user_content = (
                         "Trechos relevantes:\n" + context + "\n\n"
-                        "Resultados extraídos (JSON):\n" + json.dumps(results, ensure_ascii=False) + "\n\n"
+                        "Resultados extraídos (JSON):\n" + _json_dumps(results) + "\n\n"
                         "Produza um texto corrido, com seções e marcadores quando útil, sem inventar informações não presentes."
                     )
                     messages = [
                         {"role": "system", "content": sys_prompt},
                         {"role": "user", "content": user_content},
                     ]
-                    detailed = llm.complete(
-                        messages,
-                        model=model,
-                        temperature=max(0.1, min(temperature, 0.7)),
-                        max_output_tokens=min(max_output_tokens, 1200),
-                    )
+                    # Streaming quando o cliente suporta: o usuário vê o texto
+                    # crescer em vez de esperar a resposta completa bloqueando
+                    if hasattr(llm, "stream"):
+                        detailed = st.write_stream(
+                            llm.stream(
+                                messages,
+                                model=model,
+                                temperature=max(0.1, min(temperature, 0.7)),
+                                max_output_tokens=min(max_output_tokens, 1200),
+                            )
+                        )
+                        if not isinstance(detailed, str):
+                            detailed = "".join(detailed)
+                    else:
+                        detailed = llm.complete(
+                            messages,
+                            model=model,
+                            temperature=max(0.1, min(temperature, 0.7)),
+                            max_output_tokens=min(max_output_tokens, 1200),
+                        )
                     st.session_state["resumo_detalhado"] = detailed
                     st.success("Resumo detalhado gerado.")
                 except Exception as e:
@@ -390,57 +571,88 @@ def render_analysis_sections(
 
         st.markdown("**Resumo por cláusulas (objetivo)**")
         if st.button("Gerar resumo por cláusulas", key="btn_resumo_clausulas", disabled=not bool(text)):
-            st.session_state["active_tab"] = "Resumo jurídico"
             with st.spinner("Gerando resumo por cláusulas com IA..."):
                 try:
                     comp = results.get("clausulas_comprometedoras", []) or []
                     padrao = results.get("clausulas_padrao", []) or []
+                    cache = _get_semantic_cache()
+                    text_id = st.session_state.get("last_text_id", "")
 
-                    sections = []
-                    # Gera um resumo por cláusula, baseado estritamente no texto da própria cláusula
+                    # Uma única chamada em lote resume todas as cláusulas de uma vez:
+                    # N ida-e-voltas viram 1 e o system prompt é pago uma única vez
+                    clauses = []
                     for c in comp:
                         titulo = c.get("titulo") or c.get("tipo") or "Cláusula"
                         trecho = (c.get("texto_origem") or "").strip()
-                        sys_prompt = (
-                            "Você é um analista jurídico. Resuma cada cláusula de forma OBJETIVA, "
-                            "SEM inventar informações. USE APENAS o texto fornecido da cláusula. "
-                            "Se algo não estiver no texto, escreva 'não informado'. Formato EXATO:\n"
-                            "- Obrigações: <texto>\n- Condições: <texto>\n- Penalidades: <texto>\n- Riscos: <texto>\n"
-                        )
-                        user_content = f"Cláusula: {titulo}\nTexto da cláusula:\n{trecho}"
-                        messages = [
-                            {"role": "system", "content": sys_prompt},
-                            {"role": "user", "content": user_content},
-                        ]
-                        summary = llm.complete(
-                            messages,
-                            model=model,
-                            temperature=max(0.0, min(temperature, 0.2)),
-                            max_output_tokens=min(max_output_tokens, 220),
-                        )
-                        sections.append(f"### {titulo}\n{summary.strip()}")
-
+                        clauses.append({"id": len(clauses) + 1, "titulo": titulo, "texto": trecho})
                     for c in padrao:
                         titulo = c.get("tipo") or c.get("titulo") or "Cláusula"
                         trecho = (c.get("texto_origem") or c.get("desvio") or "").strip()
+                        clauses.append({"id": len(clauses) + 1, "titulo": titulo, "texto": trecho})
+
+                    # Dedup: cláusulas com o mesmo texto (ex.: listadas como
+                    # comprometedoras E como desvio) vão uma única vez ao lote;
+                    # o resumo do representante é reaproveitado nas repetidas
+                    alias = {}
+                    unique_clauses = []
+                    first_seen = {}
+                    for cl in clauses:
+                        norm = " ".join(cl["texto"].lower().split())
+                        if norm and norm in first_seen:
+                            alias[cl["id"]] = first_seen[norm]
+                        else:
+                            first_seen[norm] = cl["id"]
+                            alias[cl["id"]] = cl["id"]
+                            unique_clauses.append(cl)
+
+                    sections = []
+                    if clauses:
                         sys_prompt = (
-                            "Você é um analista jurídico. Resuma cada cláusula de forma OBJETIVA, "
-                            "SEM inventar informações. USE APENAS o texto fornecido da cláusula. "
-                            "Se algo não estiver no texto, escreva 'não informado'. Formato EXATO:\n"
-                            "- Obrigações: <texto>\n- Condições: <texto>\n- Penalidades: <texto>\n- Riscos: <texto>\n"
+                            "Você é um analista jurídico. Resuma CADA cláusula de forma OBJETIVA, "
+                            "SEM inventar informações. USE APENAS o texto fornecido de cada cláusula. "
+                            "Se algo não estiver no texto, escreva 'não informado'. "
+                            "Responda SOMENTE com um objeto JSON no formato "
+                            '{"resumos": [{"id": <id da cláusula>, "resumo": "- Obrigações: <texto>\\n- Condições: <texto>\\n- Penalidades: <texto>\\n- Riscos: <texto>"}]}.'
                         )
-                        user_content = f"Cláusula: {titulo}\nTexto da cláusula:\n{trecho}"
+                        user_content = "Cláusulas (JSON):\n" + _json_dumps(unique_clauses)
                         messages = [
                             {"role": "system", "content": sys_prompt},
                             {"role": "user", "content": user_content},
                         ]
-                        summary = llm.complete(
-                            messages,
-                            model=model,
-                            temperature=max(0.0, min(temperature, 0.2)),
-                            max_output_tokens=min(max_output_tokens, 200),
-                        )
-                        sections.append(f"### {titulo}\n{summary.strip()}")
+                        from src.analyzer import _clean_output, _safe_json_loads
+
+                        def _parse_resumos(raw_text):
+                            parsed = _safe_json_loads(_clean_output(raw_text or ""))
+                            out = {}
+                            for item in parsed.get("resumos", []) or []:
+                                try:
+                                    out[int(item.get("id"))] = str(item.get("resumo") or "").strip()
+                                except Exception:
+                                    continue
+                            return out
+
+                        batch_key = _answer_cache_key(user_content, model, temperature, max_output_tokens)
+                        by_id = _parse_resumos(cache.get(text_id, batch_key))
+                        if not by_id:
+                            # Orçamento por cláusula (~220 tokens, o teto do fluxo
+                            # antigo por chamada): o lote inteiro sai em uma resposta
+                            # e não pode ser truncado pelo limite pensado por chamada
+                            batch_tokens = max(max_output_tokens, 220 * len(unique_clauses) + 200)
+                            raw = llm.complete(
+                                messages,
+                                model=model,
+                                temperature=max(0.0, min(temperature, 0.2)),
+                                max_output_tokens=batch_tokens,
+                                response_mime_type="application/json",
+                            )
+                            by_id = _parse_resumos(raw)
+                            # Só persistir respostas que renderam ao menos um resumo:
+                            # um JSON truncado cacheado serviria vazio por 7 dias
+                            if by_id:
+                                cache.put(text_id, batch_key, raw)
+                        for cl in clauses:
+                            resumo = by_id.get(alias.get(cl["id"], cl["id"]), "não informado")
+                            sections.append(f"### {cl['titulo']}\n{resumo}")
 
                     clause_summary_md = "\n\n".join(sections)
                     st.session_state["resumo_por_clausulas"] = clause_summary_md
@@ -469,44 +681,123 @@ def render_analysis_sections(
             )
 
 
-def render_qa_section(text: str, llm: GroqLLM, model: str, temperature: float, max_output_tokens: int):
+@st.cache_data(show_spinner=False)
+def _cached_qa_answer(
+    text_id: str,
+    question: str,
+    provider: str,
+    model: str,
+    temperature: float,
+    max_output_tokens: int,
+    _text: str,
+    _llm,
+) -> str:
+    """Cacheia respostas de perguntas por (contrato, pergunta, parâmetros) — perguntas repetidas voltam na hora."""
+    top_chunks = _retrieve_cached(text_id, question, 5, _text)
+    messages = _build_qa_messages(question, top_chunks)
+    return _llm.complete(messages, model=model, temperature=temperature, max_output_tokens=max_output_tokens)
+
+
+def _build_qa_messages(question: str, top_chunks):
+    context = "\n\n".join(top_chunks)
+    return [
+        {
+            "role": "system",
+            "content": (
+                "Você é um assistente jurídico em português. Responda com base nos trechos"
+                " do contrato fornecidos abaixo. Se a resposta não estiver claramente no"
+                " contrato, diga explicitamente que não há evidência suficiente. Seja"
+                " preciso, cite trechos quando possível."
+            ),
+        },
+        {
+            "role": "user",
+            "content": (
+                f"Pergunta: {question}\n\nTrechos relevantes selecionados:\n{context}\n\n"
+                "Se necessário, considere o restante do contrato, mas priorize os trechos."
+            ),
+        },
+    ]
+
+
+# Perguntas com cosseno >= este limiar são tratadas como repetição semântica
+QA_SEMANTIC_THRESHOLD = 0.95
+
+# Saudações/entradas triviais que não justificam rodar RAG + IA
+_TRIVIAL_QUESTION_RE = re.compile(
+    r"^(oi|ol[áa]|bom dia|boa tarde|boa noite|obrigad[oa]|ok|teste)[\s!.?]*$",
+    re.IGNORECASE,
+)
+
+
+def _answer_cache_key(prompt_text: str, model: str, temperature: float, max_output_tokens: int) -> str:
+    """Chave exata do cache de respostas: prompt normalizado + parâmetros de geração."""
+    normalized = re.sub(r"\s+", " ", prompt_text).strip().lower()
+    payload = f"{normalized}|{model}|{temperature}|{max_output_tokens}"
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def render_qa_section(text: str, llm, provider: str, model: str, temperature: float, max_output_tokens: int):
     st.header("Perguntas sobre o contrato")
     question = st.text_input("Digite sua pergunta")
     if st.button("Responder", disabled=not bool(text)):
         if not text:
             st.warning("Carregue um contrato primeiro.")
             return
+        # Roteador barato: perguntas vazias/triviais nem chegam ao RAG ou à IA
+        question = question.strip()
+        if not question:
+            st.warning("Digite uma pergunta antes de enviar.")
+            return
+        if len(question) < 8 or _TRIVIAL_QUESTION_RE.match(question):
+            st.info("Pergunta muito curta ou genérica — descreva o que deseja saber sobre o contrato.")
+            return
         with st.spinner("Buscando trechos relevantes e consultando a IA..."):
-            top_chunks = retrieve_relevant_chunks(question, text, top_k=5)
-            context = "\n\n".join(top_chunks)
-            messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        "Você é um assistente jurídico em português. Responda com base nos trechos"
-                        " do contrato fornecidos abaixo. Se a resposta não estiver claramente no"
-                        " contrato, diga explicitamente que não há evidência suficiente. Seja"
-                        " preciso, cite trechos quando possível."
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        f"Pergunta: {question}\n\nTrechos relevantes selecionados:\n{context}\n\n"
-                        "Se necessário, considere o restante do contrato, mas priorize os trechos."
-                    ),
-                },
-            ]
-            answer = llm.complete(messages, model=model, temperature=temperature, max_output_tokens=max_output_tokens)
-            st.markdown("**Resposta:**")
-            st.write(answer)
+            text_id = st.session_state.get("last_text_id", "")
+            # Cache semântico persistente: reformulações da mesma pergunta
+            # ("qual o prazo?" vs "quando vence?") reaproveitam a resposta sem ir à IA
+            cache = _get_semantic_cache()
+            from src.rag import query_vector
+
+            q_vec = query_vector(_get_rag_index(text_id, text), question)
+            qa_key = _answer_cache_key(question, model, temperature, max_output_tokens)
+            answer = cache.get(text_id, qa_key, q_vec=q_vec, threshold=QA_SEMANTIC_THRESHOLD)
+            if answer is not None:
+                st.markdown("**Resposta:**")
+                st.write(answer)
+            elif hasattr(llm, "stream"):
+                # Streaming: tokens aparecem conforme chegam, em vez de esperar a resposta inteira
+                top_chunks = _retrieve_cached(text_id, question, 5, text)
+                messages = _build_qa_messages(question, top_chunks)
+                st.markdown("**Resposta:**")
+                answer = st.write_stream(
+                    llm.stream(messages, model=model, temperature=temperature, max_output_tokens=max_output_tokens)
+                )
+                if isinstance(answer, str):
+                    cache.put(text_id, qa_key, answer, q_vec=q_vec)
+            else:
+                answer = _cached_qa_answer(
+                    text_id,
+                    question,
+                    provider,
+                    model,
+                    temperature,
+                    max_output_tokens,
+                    text,
+                    llm,
+                )
+                cache.put(text_id, qa_key, answer, q_vec=q_vec)
+                st.markdown("**Resposta:**")
+                st.write(answer)
 
 
 def main():
     render_header()
 
-    # Autenticação
-    authenticator = init_authenticator()
+    # Autenticação (streamlit_authenticator só é importado após o primeiro paint)
+    from streamlit_authenticator.utilities.exceptions import LoginError
+
+    authenticator = _get_authenticator()
     # Compatível com versões recentes do streamlit-authenticator: login não retorna tupla,
     # armazena em st.session_state ('name', 'authentication_status', 'username').
     try:
@@ -535,19 +826,18 @@ def main():
     if not api_key:
         st.info("Informe sua API Key do provedor selecionado nas configurações para usar a IA.")
 
-    llm = GroqLLM(api_key=api_key) if provider == "Groq" else GeminiLLM(api_key=api_key)
+    llm = _get_llm(provider, api_key)
     text = render_upload_and_preview()
 
     if text:
-        # Se o texto mudar, limpar resultados anteriores
-        try:
-            current_text_id = hashlib.md5(text.encode("utf-8")).hexdigest()
-            if st.session_state.get("last_text_id") != current_text_id:
-                st.session_state["last_text_id"] = current_text_id
-                st.session_state.pop("analysis_results", None)
-                st.session_state.pop("resumo_detalhado", None)
-        except Exception:
-            pass
+        # Se o texto mudar, limpar resultados anteriores (id já memoizado no upload)
+        current_text_id = st.session_state.get("current_text_id")
+        if current_text_id and st.session_state.get("last_text_id") != current_text_id:
+            st.session_state["last_text_id"] = current_text_id
+            st.session_state.pop("analysis_results", None)
+            st.session_state.pop("resumo_detalhado", None)
+            st.session_state.pop("resumo_por_clausulas", None)
+            st.session_state.pop("pdf_bytes", None)
 
         if st.button("Analisar contrato", type="primary"):
             with st.spinner("Analisando contrato com IA (Groq)..."):
@@ -563,14 +853,16 @@ def main():
                         except Exception:
                             pass
 
-                    results = analyze_contract(
+                    results = _cached_analyze_contract(
+                        st.session_state.get("last_text_id", ""),
+                        provider,
+                        model,
+                        temperature,
+                        max_output_tokens,
+                        max_chunks,
                         text,
                         llm,
-                        model=model,
-                        temperature=temperature,
-                        max_output_tokens=max_output_tokens,
-                        max_chunks=max_chunks,
-                        progress_hook=_progress,
+                        _progress,
                     )
                     st.session_state["analysis_results"] = results
                     st.success("Análise concluída.")
@@ -581,7 +873,7 @@ def main():
         if saved_results:
             render_analysis_sections(saved_results, text, llm, model, temperature, max_output_tokens)
 
-        render_qa_section(text, llm, model, temperature, max_output_tokens)
+        render_qa_section(text, llm, provider, model, temperature, max_output_tokens)
 
 
 if __name__ == "__main__":
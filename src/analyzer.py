@@ -1,19 +1,95 @@
+import asyncio
+import hashlib
 import json
 import re
-from typing import Dict, Any, Tuple, Optional, Callable
+import time
+from bisect import bisect_right
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple, Optional, Callable
 
-from .prompts import EXTRACTION_SYSTEM_PROMPT, build_extraction_user_prompt
+from .prompts import (
+    EXTRACTION_SYSTEM_PROMPT,
+    build_batch_extraction_user_prompt,
+    build_extraction_user_prompt,
+)
 from .llm_client import GroqLLM
 from .rag import _chunk_text, retrieve_relevant_chunks
 
+# orjson: parser JSON em C, 2-3x mais rápido que a stdlib; opcional
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+
+def _loads(text: str) -> Dict[str, Any]:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+_FENCE_RE = re.compile(r"```(?:json)?")
+
 
 def _clean_output(raw: str) -> str:
     """Remove cercas de código e espaços extras."""
     if not raw:
         return ""
-    cleaned = raw.strip()
-    cleaned = cleaned.replace("```json", "").replace("```", "")
-    return cleaned
+    # Um único sub cobre ```json e ``` (antes eram dois replace encadeados)
+    return _FENCE_RE.sub("", raw).strip()
+
+
+# Padrões de _clean_summary_text compilados uma única vez no import: a função
+# roda a cada análise e os padrões construídos por f-string não aproveitariam
+# o cache interno do módulo re
+# NBSP e zero-widths saem em uma só passada C antes do conserto de acentos
+_PRE_TRANS = str.maketrans({"\u00A0": " ", "\u200B": None, "\u200C": None, "\u200D": None})
+_ACUTE_MAP = {"a": "á", "e": "é", "i": "í", "o": "ó", "u": "ú", "A": "Á", "E": "É", "I": "Í", "O": "Ó", "U": "Ú"}
+# Agudo, grave e marcadores órfãos em uma só alternância: um sub cobre o que
+# antes eram dois subs mais a remoção de marcadores remanescentes
+_ACCENT_RE = re.compile(r"(?P<acute>[AaEeIiOoUu])\s*[ˊ´]|(?P<grave>[Aa])\s*ˋ|(?P<stray>[ˊˋ])")
+
+
+def _accent_repl(m: "re.Match[str]") -> str:
+    a = m.group("acute")
+    if a:
+        return _ACUTE_MAP.get(a, a)
+    g = m.group("grave")
+    if g:
+        return "À" if g.isupper() else "à"
+    return ""
+
+_ALPHA = r"A-Za-zÀ-ÖØ-öø-ÿ"
+_LETTER_RUN_RE = re.compile(rf"(?:\b[{_ALPHA}]\b(?:\s+\b[{_ALPHA}]\b){{2,}})")
+_LETTER_RE = re.compile(rf"[{_ALPHA}]")
+_ANY_WS_RE = re.compile(r"\s+")
+_CASE_BOUNDARY_RE = re.compile(r"([a-záéíóúãõç])([A-ZÁÉÍÓÚÃÕÇ])")
+_PUNCT_RE = re.compile(r"\s*([,.;:])\s*")
+# União dos três padrões de espaço-em-número originais, em uma só passada
+_NUM_WS_RE = re.compile(r"(?<=\d)\s+(?=[\.,\d])|(?<=[\.,])\s+(?=\d)")
+_BRL_SYMBOL_RE = re.compile(r"\bR\s*(?=\d)")
+_LEADS_RE = re.compile(
+    r"(?<!^)\s+((?:O contrato estabelece|As partes|A TERRENISTA|A EMPREENDEDORA)\b)"
+)
+_MULTI_SPACE_RE = re.compile(r"\s{2,}")
+
+# Sonda de sujeira: um único search que cobre todos os sintomas que o
+# pipeline corrige. Sem match, o texto já está limpo e volta intocado —
+# o caso comum em resumos bem formados pelo LLM.
+_DIRTY_PROBE_RE = re.compile(
+    r"[ ​‌‍´ˊˋ\t\n\r]"  # espaços especiais e marcadores de acento
+    r"|\s{2,}"  # espaços duplicados
+    r"|\s[,.;:]"  # espaço antes de pontuação
+    r"|[,.;:](?=\S)"  # pontuação sem espaço depois
+    r"|[a-záéíóúãõç][A-ZÁÉÍÓÚÃÕÇ]"  # minúscula grudada em maiúscula
+    r"|\bR\s*\d"  # "R 100" sem cifrão
+    r"|\d\s+[\d.,]|[.,]\s+\d"  # espaços dentro de números
+    rf"|\b[{_ALPHA}]\b\s+\b[{_ALPHA}]\b\s+\b[{_ALPHA}]\b"  # letras espaçadas
+    # frases-guia que _LEADS_RE paragrafa: sem elas aqui, um resumo de linha
+    # única "limpo" sairia sem as quebras de parágrafo do pipeline completo
+    r"|\s(?:O contrato estabelece|As partes|A TERRENISTA|A EMPREENDEDORA)\b"
+)
 
 
 def _clean_summary_text(text: str) -> str:
@@ -25,69 +101,370 @@ def _clean_summary_text(text: str) -> str:
     """
     if not text:
         return ""
+    # Saída rápida: texto sem nenhum sintoma de sujeira volta como está
+    if _DIRTY_PROBE_RE.search(text) is None:
+        return text.strip()
     s = text
     try:
         # Remover espaços especiais e zero-width
-        s = s.replace("\u00A0", " ")
-        s = re.sub(r"[\u200B\u200C\u200D]", "", s)
-        # Corrigir acentos escritos como letra + marcador
-        acute_map = {"a": "á", "e": "é", "i": "í", "o": "ó", "u": "ú", "A": "Á", "E": "É", "I": "Í", "O": "Ó", "U": "Ú"}
-        def _acute_repl(m):
-            return acute_map.get(m.group(1), m.group(1))
-        s = re.sub(r"([AaEeIiOoUu])\s*[ˊ´]", _acute_repl, s)
-        s = re.sub(r"([Aa])\s*ˋ", lambda m: "À" if m.group(1).isupper() else "à", s)
-        # Remover marcadores remanescentes
-        s = s.replace("ˋ", "").replace("ˊ", "")
+        s = s.translate(_PRE_TRANS)
+        # Corrigir acentos escritos como letra + marcador e remover marcadores órfãos
+        s = _ACCENT_RE.sub(_accent_repl, s)
         # Unir sequências de letras separadas por espaços: "p e l a" -> "pela"; "E M P..." -> "EMP..."
-        alpha = r"A-Za-zÀ-ÖØ-öø-ÿ"
-        s = re.sub(
-            rf"(?:\b[{alpha}]\b(?:\s+\b[{alpha}]\b){{2,}})",
-            lambda m: "".join(re.findall(rf"[{alpha}]", m.group(0))),
-            s,
-        )
+        s = _LETTER_RUN_RE.sub(lambda m: "".join(_LETTER_RE.findall(m.group(0))), s)
         # Colapsar qualquer whitespace em um único espaço
-        s = re.sub(r"\s+", " ", s)
+        s = _ANY_WS_RE.sub(" ", s)
         # Espaço entre minúscula e MAIÚSCULA grudadas
-        s = re.sub(r"([a-záéíóúãõç])([A-ZÁÉÍÓÚÃÕÇ])", r"\1 \2", s)
+        s = _CASE_BOUNDARY_RE.sub(r"\1 \2", s)
         # Ajuste de pontuação (sem espaço antes; um espaço depois)
-        s = re.sub(r"\s*([,.;:])\s*", r"\1 ", s)
+        s = _PUNCT_RE.sub(r"\1 ", s)
         # Remover espaços dentro de números
-        s = re.sub(r"(?<=\d)\s+(?=[\.,])", "", s)
-        s = re.sub(r"(?<=[\.,])\s+(?=\d)", "", s)
-        s = re.sub(r"(?<=\d)\s+(?=\d)", "", s)
+        s = _NUM_WS_RE.sub("", s)
         # Normalizar moeda BRL
-        s = re.sub(r"\bR\s*(?=\d)", "R$ ", s)
+        s = _BRL_SYMBOL_RE.sub("R$ ", s)
+        # Espaços finais (antes de paragrafar: o colapso de \s{2,} engolia
+        # as quebras \n\n recém-inseridas e anulava o passo seguinte)
+        s = _MULTI_SPACE_RE.sub(" ", s)
         # Paragrafar por padrões recorrentes para leitura
-        leads = [
-            "O contrato estabelece",
-            "As partes",
-            "A TERRENISTA",
-            "A EMPREENDEDORA",
-        ]
-        for phrase in leads:
-            s = re.sub(rf"(?<!^)\s+({phrase}\b)", r"\n\n\1", s)
-        # Espaços finais
-        s = re.sub(r"\s{2,}", " ", s)
+        s = _LEADS_RE.sub(r"\n\n\1", s)
         return s.strip()
     except Exception:
         return text
 
 
+# Vírgula pendurada antes de fechar lista/objeto: ",]" ou ",}"
+_TRAILING_COMMA_RE = re.compile(r",(\s*[\]}])")
+
+
 def _safe_json_loads(text: str) -> Dict[str, Any]:
     try:
-        return json.loads(text)
+        return _loads(text)
     except Exception:
-        # Tentativa de recuperar JSON envolto em markdown ou com texto extra
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            try:
-                return json.loads(text[start : end + 1])
-            except Exception:
-                pass
+        # Recupera JSON envolto em markdown/texto extra com uma única
+        # varredura para a frente, rastreando a profundidade de chaves e se
+        # estamos dentro de uma string — um '}' em texto de cláusula citada
+        # não pode encerrar o objeto (find/rfind erravam exatamente nisso)
+        # Salta em C direto para a primeira '{': o prefixo antes dela
+        # (markdown, texto do modelo) nunca contém o objeto
+        first = text.find("{")
+        if first == -1:
+            return {}
+        depth = 0
+        start = -1
+        in_string = False
+        escaped = False
+        for i, c in enumerate(text[first:], first):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif c == "\\":
+                    escaped = True
+                elif c == '"':
+                    in_string = False
+                continue
+            if c == '"':
+                if depth > 0:
+                    in_string = True
+            elif c == "{":
+                if depth == 0:
+                    start = i
+                depth += 1
+            elif c == "}" and depth > 0:
+                depth -= 1
+                if depth == 0:
+                    candidate = text[start : i + 1]
+                    try:
+                        return _loads(candidate)
+                    except Exception:
+                        # Último conserto local antes de desistir: vírgulas
+                        # penduradas antes de ] ou } (erro comum de LLM) —
+                        # reparar aqui é grátis, repetir a chamada não é
+                        try:
+                            return _loads(_TRAILING_COMMA_RE.sub(r"\1", candidate))
+                        except Exception:
+                            return {}
         return {}
 
 
+# Cache persistente (sqlite) das respostas brutas de extração: chunks de
+# boilerplate repetidos entre contratos — e re-análises do mesmo contrato em
+# outro processo — retornam sem chamada ao LLM. Lookup exato por hash do
+# prompt completo + parâmetros; lazy para não pagar o sqlite em quem não usa.
+_RESPONSE_CACHE = None
+_EXTRACTION_NS = "extraction"
+
+
+def _get_response_cache():
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is None:
+        from .semantic_cache import SemanticCache
+
+        _RESPONSE_CACHE = SemanticCache()
+    return _RESPONSE_CACHE
+
+
+def _completion_cache_key(
+    messages: List[Dict[str, str]], model: str, temperature: float, max_output_tokens: int
+) -> str:
+    h = hashlib.sha256(f"{model}\x00{temperature}\x00{max_output_tokens}".encode("utf-8"))
+    for m in messages:
+        h.update(b"\x00")
+        h.update(m.get("role", "").encode("utf-8"))
+        h.update(b"\x00")
+        h.update(m.get("content", "").encode("utf-8"))
+    return h.hexdigest()
+
+
+def _cached_complete(
+    llm: GroqLLM,
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    max_output_tokens: int,
+) -> str:
+    """llm.complete com cache persistente por prompt (falhas de cache são ignoradas)."""
+    key = _completion_cache_key(messages, model, temperature, max_output_tokens)
+    try:
+        hit = _get_response_cache().get(_EXTRACTION_NS, key)
+        if hit is not None:
+            return hit
+    except Exception:
+        pass
+    raw = llm.complete(messages, model=model, temperature=temperature, max_output_tokens=max_output_tokens, response_mime_type="application/json")
+    if raw:
+        try:
+            _get_response_cache().put(_EXTRACTION_NS, key, raw)
+        except Exception:
+            pass
+    return raw
+
+
+async def _cached_acomplete(
+    llm: GroqLLM,
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    max_output_tokens: int,
+) -> str:
+    """Versão assíncrona de `_cached_complete`."""
+    key = _completion_cache_key(messages, model, temperature, max_output_tokens)
+    try:
+        hit = _get_response_cache().get(_EXTRACTION_NS, key)
+        if hit is not None:
+            return hit
+    except Exception:
+        pass
+    raw = await llm.acomplete(messages, model=model, temperature=temperature, max_output_tokens=max_output_tokens, response_mime_type="application/json")
+    if raw:
+        try:
+            _get_response_cache().put(_EXTRACTION_NS, key, raw)
+        except Exception:
+            pass
+    return raw
+
+
+# Cache em processo de análises completas: mesmo contrato + mesmos parâmetros
+# devolve o resultado pronto sem nenhuma chamada ao LLM (a parte cara, de
+# segundos a minutos). Entradas expiram por TTL e o total é limitado.
+_RESULT_CACHE: Dict[Tuple[str, str, float, int, int], Tuple[float, Dict[str, Any]]] = {}
+_RESULT_CACHE_TTL_SECONDS = 3600.0
+_RESULT_CACHE_MAX_ENTRIES = 100
+
+
+def _result_cache_key(
+    contract_text: str, model: str, temperature: float, max_output_tokens: int, max_chunks: int
+) -> Tuple[str, str, float, int, int]:
+    digest = hashlib.sha256((contract_text or "").encode("utf-8")).hexdigest()
+    return (digest, model, float(temperature), int(max_output_tokens), int(max_chunks))
+
+
+def _result_cache_get(key: Tuple[str, str, float, int, int]) -> Optional[Dict[str, Any]]:
+    entry = _RESULT_CACHE.get(key)
+    if entry is not None:
+        if time.time() - entry[0] < _RESULT_CACHE_TTL_SECONDS:
+            return entry[1]
+        _RESULT_CACHE.pop(key, None)
+    return None
+
+
+def _result_cache_put(key: Tuple[str, str, float, int, int], data: Dict[str, Any]) -> None:
+    # Resultados vazios não são memorizados: uma falha transitória do LLM
+    # não deve "grudar" por uma hora
+    if _is_empty_result(data):
+        return
+    if len(_RESULT_CACHE) >= _RESULT_CACHE_MAX_ENTRIES:
+        oldest = min(_RESULT_CACHE, key=lambda k: _RESULT_CACHE[k][0])
+        _RESULT_CACHE.pop(oldest, None)
+    _RESULT_CACHE[key] = (time.time(), data)
+
+
+def _new_aggregated() -> Dict[str, Any]:
+    return {
+        "datas_vencimento": [],
+        "valores_multas": [],
+        "partes": [],
+        "clausulas_comprometedoras": [],
+        "clausulas_padrao": [],
+        "analise_risco": {},
+        "resumo_juridico": "",
+    }
+
+
+# Campos que formam a chave natural de deduplicação de cada categoria
+_MERGE_KEY_FIELDS = {
+    "datas_vencimento": ("descricao", "data_iso"),
+    "valores_multas": ("tipo", "percentual", "valor_monetario", "texto_origem"),
+    "partes": ("nome", "papel"),
+    "clausulas_comprometedoras": ("titulo", "parte_afetada", "gravidade", "texto_origem"),
+    "clausulas_padrao": ("tipo", "presente", "texto_origem"),
+}
+
+
+def _merge_chunk_results(chunk_results: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[str]]:
+    """Mescla os resultados de todos os chunks de uma vez, deduplicando por chave natural.
+
+    Um dict por categoria com setdefault faz a deduplicação em uma operação de
+    hash por item (primeira ocorrência vence, preservando a ordem), em vez das
+    três operações do esquema anterior com sets `seen` separados.
+    """
+    aggregated = _new_aggregated()
+    for field, key_fields in _MERGE_KEY_FIELDS.items():
+        by_key: Dict[tuple, Dict[str, Any]] = {}
+        for dc in chunk_results:
+            for it in dc.get(field) or []:
+                by_key.setdefault(tuple(it.get(k) for k in key_fields), it)
+        aggregated[field] = list(by_key.values())
+
+    summaries = [
+        dc["resumo_juridico"].strip() for dc in chunk_results if dc.get("resumo_juridico")
+    ]
+    return aggregated, summaries
+
+
+# Memoização do chunking por conteúdo: re-análises do mesmo contrato (retry
+# após erro, mudança só de parâmetros do modelo) não refazem a divisão do
+# texto. A chave é hash (blake2b, mais rápido que sha256) + max_chars.
+_CHUNKS_CACHE: Dict[Tuple[str, int], List[str]] = {}
+_CHUNKS_CACHE_MAX_ENTRIES = 32
+
+
+def _chunks_for(contract_text: str, max_chars: int = 1400) -> List[str]:
+    key = (
+        hashlib.blake2b(contract_text.encode("utf-8"), digest_size=16).hexdigest(),
+        max_chars,
+    )
+    chunks = _CHUNKS_CACHE.get(key)
+    if chunks is None:
+        if len(_CHUNKS_CACHE) >= _CHUNKS_CACHE_MAX_ENTRIES:
+            _CHUNKS_CACHE.pop(next(iter(_CHUNKS_CACHE)))
+        chunks = _CHUNKS_CACHE[key] = _chunk_text(contract_text, max_chars=max_chars)
+    return chunks
+
+
+# Quantos chunks vão juntos em cada chamada de extração: amortiza o system
+# prompt e reduz o número de round-trips (importante sob limite de RPM)
+EXTRACTION_BATCH_SIZE = 3
+
+# Abaixo disso um chunk vazio não justifica a segunda chamada estrita:
+# trechos tão curtos raramente rendem extração mesmo com prompt reforçado
+_STRICT_RETRY_MIN_CHARS = 200
+
+# Indicadores de conteúdo extraível: valores em R$, datas, vocabulário de
+# cláusula/multa/vencimento e denominações das partes. Chunk sem nenhum
+# deles (índice, cabeçalhos, texto genérico) dificilmente rende extração.
+_SIGNAL_RE = re.compile(
+    r"R\$|\d{1,2}/\d{1,2}/\d{2,4}|\d{4}-\d{2}-\d{2}"
+    r"|\bCL[ÁA]USULA\b|\bMULTA\b|\bVENCIMENTO\b|\bPRAZO\b|\bRESCIS[ÃA]O\b"
+    r"|\bCONTRATANTE\b|\bCONTRATADA?\b|\bCNPJ\b|\bCPF\b",
+    re.IGNORECASE,
+)
+
+
+def _filter_signal_chunks(chunks: List[str]) -> List[str]:
+    """Remove chunks sem nenhum indicador de conteúdo extraível.
+
+    Primeiro e último chunks ficam sempre (identificação das partes e
+    assinaturas costumam morar lá); se o filtro descartasse mais de 70% do
+    contrato, mantém a lista original — sinal de que o padrão não casa com
+    o vocabulário deste documento.
+    """
+    if len(chunks) <= 2:
+        return chunks
+    kept = [
+        ch
+        for i, ch in enumerate(chunks)
+        if i == 0 or i == len(chunks) - 1 or _SIGNAL_RE.search(ch)
+    ]
+    if len(kept) < len(chunks) * 0.3:
+        return chunks
+    return kept
+
+
+def _extract_chunk(
+    llm: GroqLLM,
+    chunk_text: str,
+    model: str,
+    temperature: float,
+    max_output_tokens: int,
+) -> Dict[str, Any]:
+    """Extrai um único chunk, com a segunda tentativa estrita em caso de vazio."""
+    messages = [
+        {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+        {"role": "user", "content": build_extraction_user_prompt(chunk_text)},
+    ]
+    output = _cached_complete(llm, messages, model, temperature, max_output_tokens)
+    data_chunk = _safe_json_loads(_clean_output(output))
+
+    if _is_empty_result(data_chunk) and len(chunk_text) >= _STRICT_RETRY_MIN_CHARS:
+        # O system prompt fica byte-idêntico ao da primeira chamada: provedores
+        # com prefix caching reaproveitam o prefixo estável; a instrução
+        # estrita vai como sufixo da mensagem de usuário
+        strict_messages = [
+            {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+            {"role": "user", "content": build_extraction_user_prompt(chunk_text) + "\nResponda SOMENTE com JSON válido, sem markdown e sem texto fora. Retorne apenas o JSON começando com '{' e terminando com '}'."},
+        ]
+        output2 = _cached_complete(llm, strict_messages, model, max(0.0, temperature - 0.1), max_output_tokens)
+        data_chunk = _safe_json_loads(_clean_output(output2))
+
+    return _ensure_schema(data_chunk)
+
+
+def _batch_messages(batch: List[str]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT + " Você receberá vários trechos numerados; responda com um objeto JSON contendo a chave 'resultados'."},
+        {"role": "user", "content": build_batch_extraction_user_prompt(batch)},
+    ]
+
+
+def _parse_batch_payload(raw: str, expected: int) -> Optional[List[Dict[str, Any]]]:
+    """Valida a resposta em lote: precisa de um resultado por trecho, em ordem."""
+    parsed = _safe_json_loads(_clean_output(raw))
+    lst = parsed.get("resultados")
+    if isinstance(lst, list) and len(lst) == expected:
+        return [_ensure_schema(item if isinstance(item, dict) else {}) for item in lst]
+    return None
+
+
+def _extract_batch(
+    llm: GroqLLM,
+    batch: List[str],
+    model: str,
+    temperature: float,
+    max_output_tokens: int,
+) -> List[Dict[str, Any]]:
+    """Extrai um lote de chunks em uma chamada; recai em chamadas unitárias se o lote falhar."""
+    if len(batch) == 1:
+        return [_extract_chunk(llm, batch[0], model, temperature, max_output_tokens)]
+    try:
+        raw = _cached_complete(llm, _batch_messages(batch), model, temperature, max_output_tokens)
+        results = _parse_batch_payload(raw, len(batch))
+        if results is not None:
+            return results
+    except Exception:
+        pass
+    return [_extract_chunk(llm, ch, model, temperature, max_output_tokens) for ch in batch]
+
+
 def analyze_contract(
     contract_text: str,
     llm: GroqLLM,
@@ -97,10 +474,15 @@ def analyze_contract(
     max_chunks: int = 12,
     progress_hook: Optional[Callable[[int, int], None]] = None,
 ) -> Dict[str, Any]:
+    cache_key = _result_cache_key(contract_text, model, temperature, max_output_tokens, max_chunks)
+    cached = _result_cache_get(cache_key)
+    if cached is not None:
+        return cached
+
     # Fallback: se o contrato for muito grande, analisa em chunks para evitar limites de tokens/TPM
     text_len = len(contract_text or "")
     if text_len > 12000:
-        chunks = _chunk_text(contract_text, max_chars=1400)
+        chunks = _chunks_for(contract_text, max_chars=1400)
         total = len(chunks)
         # Se houver muitos chunks, limitar a quantidade para evitar travamentos
         if total > max_chunks:
@@ -116,95 +498,45 @@ def analyze_contract(
                 chunks = chunks[:max_chunks]
                 total = len(chunks)
 
-        aggregated = {
-            "datas_vencimento": [],
-            "valores_multas": [],
-            "partes": [],
-            "clausulas_comprometedoras": [],
-            "clausulas_padrao": [],
-            "analise_risco": {},
-            "resumo_juridico": "",
-        }
-        summaries = []
-        seen_venc = set()
-        seen_multas = set()
-        seen_partes = set()
-        seen_comp = set()
-        seen_padrao = set()
-
-        for idx, ch in enumerate(chunks):
-            messages = [
-                {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
-                {"role": "user", "content": build_extraction_user_prompt(ch)},
-            ]
-            output = llm.complete(messages, model=model, temperature=temperature, max_output_tokens=max_output_tokens, response_mime_type="application/json")
-            data_chunk = _safe_json_loads(_clean_output(output))
-
-            if _is_empty_result(data_chunk):
-                strict_messages = [
-                    {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT + " Responda SOMENTE com JSON válido, sem markdown e sem texto fora."},
-                    {"role": "user", "content": build_extraction_user_prompt(ch) + "\nRetorne apenas o JSON começando com '{' e terminando com '}'."},
-                ]
-                output2 = llm.complete(strict_messages, model=model, temperature=max(0.0, temperature - 0.1), max_output_tokens=max_output_tokens, response_mime_type="application/json")
-                data_chunk = _safe_json_loads(_clean_output(output2))
-
-            data_chunk = _ensure_schema(data_chunk)
-
-            # Merge datas_vencimento
-            for it in data_chunk.get("datas_vencimento", []) or []:
-                key = (it.get("descricao"), it.get("data_iso"))
-                if key not in seen_venc:
-                    aggregated["datas_vencimento"].append(it)
-                    seen_venc.add(key)
-
-            # Merge valores_multas
-            for it in data_chunk.get("valores_multas", []) or []:
-                key = (it.get("tipo"), it.get("percentual"), it.get("valor_monetario"), it.get("texto_origem"))
-                if key not in seen_multas:
-                    aggregated["valores_multas"].append(it)
-                    seen_multas.add(key)
-
-            # Merge partes
-            for it in data_chunk.get("partes", []) or []:
-                key = (it.get("nome"), it.get("papel"))
-                if key not in seen_partes:
-                    aggregated["partes"].append(it)
-                    seen_partes.add(key)
-
-            # Merge clausulas_comprometedoras
-            for it in data_chunk.get("clausulas_comprometedoras", []) or []:
-                key = (it.get("titulo"), it.get("parte_afetada"), it.get("gravidade"), it.get("texto_origem"))
-                if key not in seen_comp:
-                    aggregated["clausulas_comprometedoras"].append(it)
-                    seen_comp.add(key)
-
-            # Merge clausulas_padrao
-            for it in data_chunk.get("clausulas_padrao", []) or []:
-                key = (it.get("tipo"), it.get("presente"), it.get("texto_origem"))
-                if key not in seen_padrao:
-                    aggregated["clausulas_padrao"].append(it)
-                    seen_padrao.add(key)
-
-            # Coleta resumo do chunk, se houver
-            summary = data_chunk.get("resumo_juridico")
-            if summary:
-                summaries.append(summary.strip())
+        # Chunks idênticos (boilerplate de template, blocos de assinatura)
+        # só precisam de uma chamada; o merge por chave já absorve repetições
+        unique_chunks = list(dict.fromkeys(chunks))
+        if len(unique_chunks) < total:
+            chunks = unique_chunks
+            total = len(chunks)
+
+        # Pré-filtro barato: chunks sem sinal extraível não vão ao LLM
+        chunks = _filter_signal_chunks(chunks)
+        total = len(chunks)
+
+        # Lotes de chunks por chamada: menos round-trips e system prompt pago
+        # uma vez por lote em vez de uma vez por chunk
+        chunk_results: List[Dict[str, Any]] = []
+        done = 0
+        for i in range(0, total, EXTRACTION_BATCH_SIZE):
+            batch = chunks[i : i + EXTRACTION_BATCH_SIZE]
+            chunk_results.extend(_extract_batch(llm, batch, model, temperature, max_output_tokens))
 
             # Progresso
+            done += len(batch)
             if progress_hook:
                 try:
-                    progress_hook(idx + 1, total)
+                    progress_hook(done, total)
                 except Exception:
                     pass
 
+        aggregated, summaries = _merge_chunk_results(chunk_results)
+
         # Constrói resumo final a partir dos resumos parciais (limitado)
         if summaries:
             aggregated["resumo_juridico"] = _clean_summary_text("\n\n".join(summaries)[:4000])
 
-        aggregated = _ensure_schema(aggregated)
+        # _new_aggregated já cria todas as chaves do schema; _ensure_schema
+        # aqui só copiaria o dict
         aggregated["partes"] = _normalize_partes(aggregated.get("partes", []))
         aggregated = _normalize_values_multas(aggregated)
         aggregated = _expand_vencimento_dates(aggregated)
+        _result_cache_put(cache_key, aggregated)
         return aggregated
 
     # Contratos pequenos: comportamento original
@@ -212,16 +544,16 @@ def analyze_contract(
         {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
         {"role": "user", "content": build_extraction_user_prompt(contract_text)},
     ]
-    output = llm.complete(messages, model=model, temperature=temperature, max_output_tokens=max_output_tokens, response_mime_type="application/json")
+    output = _cached_complete(llm, messages, model, temperature, max_output_tokens)
     data = _safe_json_loads(_clean_output(output))
 
     # Se resultado vazio ou sem as principais listas, tenta uma segunda chamada mais estrita
     if _is_empty_result(data):
         strict_messages = [
-            {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT + " Responda SOMENTE com JSON válido, sem markdown e sem texto fora."},
-            {"role": "user", "content": build_extraction_user_prompt(contract_text) + "\nRetorne apenas o JSON começando com '{' e terminando com '}'."},
+            {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+            {"role": "user", "content": build_extraction_user_prompt(contract_text) + "\nResponda SOMENTE com JSON válido, sem markdown e sem texto fora. Retorne apenas o JSON começando com '{' e terminando com '}'."},
         ]
-        output2 = llm.complete(strict_messages, model=model, temperature=max(0.0, temperature - 0.1), max_output_tokens=max_output_tokens, response_mime_type="application/json")
+        output2 = _cached_complete(llm, strict_messages, model, max(0.0, temperature - 0.1), max_output_tokens)
         data = _safe_json_loads(_clean_output(output2))
 
     data = _ensure_schema(data)
@@ -232,24 +564,156 @@ def analyze_contract(
     data["partes"] = _normalize_partes(data.get("partes", []))
     data = _normalize_values_multas(data)
     data = _expand_vencimento_dates(data)
+    _result_cache_put(cache_key, data)
     return data
 
 
-def _parse_brl_amount(text: str) -> Optional[float]:
-    """Extrai o primeiro valor monetário no padrão brasileiro (R$ 1.234,56) do texto.
-    Aceita espaços opcionais no valor (ex.: "R$ 2.000.000, 00") e também o símbolo "R" sem "$".
-    Retorna float ou None se não encontrado.
+async def _extract_chunk_async(
+    llm: GroqLLM,
+    chunk_text: str,
+    model: str,
+    temperature: float,
+    max_output_tokens: int,
+) -> Dict[str, Any]:
+    """Extrai um chunk via `acomplete`, com a mesma segunda tentativa estrita do fluxo síncrono."""
+    messages = [
+        {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+        {"role": "user", "content": build_extraction_user_prompt(chunk_text)},
+    ]
+    output = await _cached_acomplete(llm, messages, model, temperature, max_output_tokens)
+    data_chunk = _safe_json_loads(_clean_output(output))
+
+    if _is_empty_result(data_chunk) and len(chunk_text) >= _STRICT_RETRY_MIN_CHARS:
+        # O system prompt fica byte-idêntico ao da primeira chamada: provedores
+        # com prefix caching reaproveitam o prefixo estável; a instrução
+        # estrita vai como sufixo da mensagem de usuário
+        strict_messages = [
+            {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+            {"role": "user", "content": build_extraction_user_prompt(chunk_text) + "\nResponda SOMENTE com JSON válido, sem markdown e sem texto fora. Retorne apenas o JSON começando com '{' e terminando com '}'."},
+        ]
+        output2 = await _cached_acomplete(llm, strict_messages, model, max(0.0, temperature - 0.1), max_output_tokens)
+        data_chunk = _safe_json_loads(_clean_output(output2))
+
+    return _ensure_schema(data_chunk)
+
+
+async def _extract_batch_async(
+    llm: GroqLLM,
+    batch: List[str],
+    model: str,
+    temperature: float,
+    max_output_tokens: int,
+) -> List[Dict[str, Any]]:
+    """Versão assíncrona de `_extract_batch` (fallback por chunk via gather)."""
+    if len(batch) == 1:
+        return [await _extract_chunk_async(llm, batch[0], model, temperature, max_output_tokens)]
+    try:
+        raw = await _cached_acomplete(llm, _batch_messages(batch), model, temperature, max_output_tokens)
+        results = _parse_batch_payload(raw, len(batch))
+        if results is not None:
+            return results
+    except Exception:
+        pass
+    return list(
+        await asyncio.gather(
+            *(_extract_chunk_async(llm, ch, model, temperature, max_output_tokens) for ch in batch)
+        )
+    )
+
+
+async def analyze_contract_async(
+    contract_text: str,
+    llm: GroqLLM,
+    model: str = "llama3-8b-8192",
+    temperature: float = 0.2,
+    max_output_tokens: int = 2000,
+    max_chunks: int = 12,
+    progress_hook: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """Versão assíncrona de `analyze_contract`.
+
+    Em contratos grandes, as chamadas de extração por chunk são independentes;
+    disparamos todas em paralelo via `asyncio.gather` em vez de uma a uma,
+    o que reduz a latência total para aproximadamente a da chamada mais lenta.
     """
-    if not text:
-        return None
-    # Padrões comuns: "R$ 1.234,56", "R$1.234", "R$ 123,45" e variações com espaços: "R$ 1.234, 56"
-    # Aceita também "R 100.000,00" e "R2.000.000,00" (sem o cifrão)
-    m = re.search(r"R\$?\s*([\d\.\s]+(?:,\s*\d{2})?)", text)
-    if not m:
-        return None
-    raw = m.group(1)
+    cache_key = _result_cache_key(contract_text, model, temperature, max_output_tokens, max_chunks)
+    cached = _result_cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    text_len = len(contract_text or "")
+    if text_len <= 12000:
+        # Contratos pequenos: uma única chamada, sem paralelismo a explorar
+        data = await _extract_chunk_async(llm, contract_text, model, temperature, max_output_tokens)
+        data["resumo_juridico"] = _clean_summary_text(data.get("resumo_juridico", ""))
+        data["partes"] = _normalize_partes(data.get("partes", []))
+        data = _normalize_values_multas(data)
+        data = _expand_vencimento_dates(data)
+        _result_cache_put(cache_key, data)
+        return data
+
+    chunks = _chunks_for(contract_text, max_chars=1400)
+    total = len(chunks)
+    if total > max_chunks:
+        try:
+            question = (
+                "Extrair datas de vencimento, multas, partes, cláusulas padrão/comprometedoras, riscos e resumo"
+            )
+            chunks = retrieve_relevant_chunks(question, contract_text, top_k=max_chunks)
+        except Exception:
+            chunks = chunks[:max_chunks]
+        total = len(chunks)
+
+    # Mesmo dedup do caminho síncrono: chunks idênticos geram uma chamada só
+    unique_chunks = list(dict.fromkeys(chunks))
+    if len(unique_chunks) < total:
+        chunks = unique_chunks
+        total = len(chunks)
+
+    # Mesmo pré-filtro de sinal do caminho síncrono
+    chunks = _filter_signal_chunks(chunks)
+    total = len(chunks)
+
+    done = 0
+
+    # Lotes em paralelo: cada chamada carrega EXTRACTION_BATCH_SIZE chunks
+    # (menos round-trips) e os lotes ainda saem todos concorrentemente
+    async def _run(batch: List[str]) -> List[Dict[str, Any]]:
+        nonlocal done
+        batch_results = await _extract_batch_async(llm, batch, model, temperature, max_output_tokens)
+        done += len(batch)
+        if progress_hook:
+            try:
+                progress_hook(done, total)
+            except Exception:
+                pass
+        return batch_results
+
+    batches = [chunks[i : i + EXTRACTION_BATCH_SIZE] for i in range(0, total, EXTRACTION_BATCH_SIZE)]
+    results = [dc for br in await asyncio.gather(*(_run(b) for b in batches)) for dc in br]
+
+    aggregated, summaries = _merge_chunk_results(results)
+
+    if summaries:
+        aggregated["resumo_juridico"] = _clean_summary_text("\n\n".join(summaries)[:4000])
+
+    aggregated["partes"] = _normalize_partes(aggregated.get("partes", []))
+    aggregated = _normalize_values_multas(aggregated)
+    aggregated = _expand_vencimento_dates(aggregated)
+    _result_cache_put(cache_key, aggregated)
+    return aggregated
+
+
+# Padrões comuns: "R$ 1.234,56", "R$1.234", "R$ 123,45" e variações com espaços: "R$ 1.234, 56"
+# Aceita também "R 100.000,00" e "R2.000.000,00" (sem o cifrão)
+_BRL_RE = re.compile(r"R\$?\s*([\d\.\s]+(?:,\s*\d{2})?)")
+_WS_RE = re.compile(r"\s+")
+
+
+def _brl_match_to_float(m: "re.Match") -> Optional[float]:
+    """Converte um match de _BRL_RE em float (ou None se inválido)."""
     # Remover espaços dentro do número antes de normalizar
-    raw = re.sub(r"\s+", "", raw)
+    raw = _WS_RE.sub("", m.group(1))
     # Converter para float: remover pontos (milhares) e trocar vírgula por ponto
     normalized = raw.replace(".", "").replace(",", ".")
     try:
@@ -258,11 +722,18 @@ def _parse_brl_amount(text: str) -> Optional[float]:
         return None
 
 
+# Troca separadores US -> PT-BR em uma única passada (sem o "@" intermediário)
+_BRL_SEP_TABLE = str.maketrans({",": ".", ".": ","})
+
+
+@lru_cache(maxsize=1024)
 def _format_brl(value: float) -> str:
-    """Formata float em moeda BRL com milhares e 2 casas decimais."""
+    """Formata float em moeda BRL com milhares e 2 casas decimais.
+
+    Memoizado: os mesmos valores de multa se repetem entre chunks e reruns.
+    """
     # Usa formatação US e ajusta para notação PT-BR
-    s = f"{value:,.2f}"
-    return "R$ " + s.replace(",", "@").replace(".", ",").replace("@", ".")
+    return "R$ " + f"{value:,.2f}".translate(_BRL_SEP_TABLE)
 
 
 def _normalize_values_multas(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -271,15 +742,30 @@ def _normalize_values_multas(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     try:
         items = data.get("valores_multas", []) or []
-        normalized = []
-        for it in items:
-            it = dict(it)  # cópia defensiva
+
+        # Uma única varredura do regex sobre todos os textos concatenados
+        # (separador \x1e nunca casa com o padrão), em vez de um search por
+        # item; o primeiro match dentro de cada texto é atribuído ao item
+        texts = [str(it.get("texto_origem", "") or "") for it in items]
+        starts: List[int] = []
+        pos = 0
+        for t in texts:
+            starts.append(pos)
+            pos += len(t) + 1
+        parsed_by_idx: Dict[int, Optional[float]] = {}
+        for m in _BRL_RE.finditer("\x1e".join(texts)):
+            idx = bisect_right(starts, m.start()) - 1
+            if idx not in parsed_by_idx:
+                parsed_by_idx[idx] = _brl_match_to_float(m)
+
+        # Mutação in-place: os dicts acabaram de sair do decode JSON (ou do
+        # merge de chunks) e ninguém mais guarda referência a eles — a cópia
+        # defensiva só dobrava as alocações
+        for i, it in enumerate(items):
             valor = it.get("valor_monetario")
             moeda = it.get("moeda")
-            texto = it.get("texto_origem", "")
 
-            # Tentar extrair sempre que houver texto; parser só reconhece padrões com prefixo "R" (com ou sem "$")
-            parsed = _parse_brl_amount(texto)
+            parsed = parsed_by_idx.get(i)
             if parsed is not None:
                 it["valor_monetario"] = _format_brl(parsed)
                 it["moeda"] = moeda or "BRL"
@@ -291,9 +777,6 @@ def _normalize_values_multas(data: Dict[str, Any]) -> Dict[str, Any]:
                         it["moeda"] = moeda or "BRL"
                 except Exception:
                     pass
-
-            normalized.append(it)
-        data["valores_multas"] = normalized
         return data
     except Exception:
         return data
@@ -316,12 +799,15 @@ def _is_empty_result(data: Dict[str, Any]) -> bool:
     if not data:
         return True
     try:
+        # analise_risco conta como conteúdo: um resultado só com risco não é
+        # "vazio" e não justifica a segunda chamada estrita ao LLM
         return not any([
             bool(data.get("datas_vencimento")),
             bool(data.get("valores_multas")),
             bool(data.get("partes")),
             bool(data.get("clausulas_comprometedoras")),
             bool(data.get("clausulas_padrao")),
+            bool(data.get("analise_risco")),
             bool(data.get("resumo_juridico")),
         ])
     except Exception:
@@ -387,9 +873,9 @@ def _normalize_partes(items):
         result = []
         for nkey, rec in by_name.items():
             tipos = [t for t in rec.get("tipos", []) if t]
-            # tipo mais frequente ou primeiro
-            tipo_final = tipos[0] if not tipos else max(set(tipos), key=tipos.count)
-            papeis = sorted(list(rec.get("papeis", set())))
+            # tipo mais frequente (Counter é O(k); max(set, key=count) era O(k²))
+            tipo_final = Counter(tipos).most_common(1)[0][0] if tipos else ""
+            papeis = sorted(rec.get("papeis", set()))
             docs = [d for d in rec.get("docs", []) if d]
             result.append({
                 "nome": rec.get("nome", "-"),
@@ -463,9 +949,9 @@ def _normalize_partes(items):
         result = []
         for nkey, rec in by_name.items():
             tipos = [t for t in rec.get("tipos", []) if t]
-            # tipo mais frequente ou primeiro
-            tipo_final = tipos[0] if not tipos else max(set(tipos), key=tipos.count)
-            papeis = sorted(list(rec.get("papeis", set())))
+            # tipo mais frequente (Counter é O(k); max(set, key=count) era O(k²))
+            tipo_final = Counter(tipos).most_common(1)[0][0] if tipos else ""
+            papeis = sorted(rec.get("papeis", set()))
             docs = [d for d in rec.get("docs", []) if d]
             result.append({
                 "nome": rec.get("nome", "-"),
@@ -480,6 +966,21 @@ def _normalize_partes(items):
         return items or []
 
 
+# Padrões de _expand_vencimento_dates compilados no import: os rf-strings por
+# mês eram recompilados dentro de loops aninhados (12 padrões × N itens)
+_MONTHS_MAP = {
+    "janeiro": 1, "fevereiro": 2,
+    "março": 3, "marco": 3,
+    "abril": 4, "maio": 5, "junho": 6, "julho": 7, "agosto": 8,
+    "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+}
+_DAY_RE = re.compile(r"dia\s+(\d{1,2})")
+_YEAR_RE = re.compile(r"(de\s*)?(\d{4})")
+_MONTHS_ALT = "|".join(_MONTHS_MAP)
+_MONTHS_ALT_RE = re.compile(rf"\b({_MONTHS_ALT})\b")
+_MONTH_RANGE_RE = re.compile(rf"\b({_MONTHS_ALT})\s*(?:a|até)\s*({_MONTHS_ALT})\b")
+
+
 def _expand_vencimento_dates(data: Dict[str, Any]) -> Dict[str, Any]:
     """Expande datas de vencimento quando o texto menciona "dia X de cada mês"
     e lista meses com um ano (ex.: "abril, maio, junho... de 2025").
@@ -490,12 +991,7 @@ def _expand_vencimento_dates(data: Dict[str, Any]) -> Dict[str, Any]:
         if not items:
             return data
 
-        months_map = {
-            "janeiro": 1, "fevereiro": 2,
-            "março": 3, "marco": 3,
-            "abril": 4, "maio": 5, "junho": 6, "julho": 7, "agosto": 8,
-            "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
-        }
+        months_map = _MONTHS_MAP
 
         new_items = list(items)
         seen = {(i.get("descricao"), i.get("data_iso")) for i in items}
@@ -503,41 +999,33 @@ def _expand_vencimento_dates(data: Dict[str, Any]) -> Dict[str, Any]:
         for it in items:
             text = f"{it.get('descricao', '')} {it.get('texto_origem', '')}".lower()
             # Encontrar o dia
-            mday = re.search(r"dia\s+(\d{1,2})", text)
+            mday = _DAY_RE.search(text)
             if not mday:
                 continue
             day = int(mday.group(1))
 
             # Capturar ano próximo a menções de meses
-            myear = re.search(r"(de\s*)?(\d{4})", text)
+            myear = _YEAR_RE.search(text)
             year = int(myear.group(2)) if myear else None
             if not year:
                 # sem ano explícito não expandimos
                 continue
 
-            # Encontrar todos os meses citados
-            found_months = []
-            for name, num in months_map.items():
-                if re.search(rf"\b{name}\b", text):
-                    found_months.append(num)
-
-            # Também suportar intervalos "de abril a agosto"
-            # Procura "de <mes> a <mes>"
-            for start_name in months_map.keys():
-                m_range = re.search(rf"{start_name}\s*(?:a|até)\s*([a-zç]+)", text)
-                if m_range:
-                    end_name = m_range.group(1)
-                    if end_name in months_map:
-                        start_m = months_map[start_name]
-                        end_m = months_map[end_name]
-                        if start_m <= end_m:
-                            found_months.extend(list(range(start_m, end_m + 1)))
+            # Todos os meses citados em uma só varredura do texto
+            found_months = {months_map[m] for m in _MONTHS_ALT_RE.findall(text)}
+
+            # Também suportar intervalos "de abril a agosto", idem em uma varredura
+            for start_name, end_name in _MONTH_RANGE_RE.findall(text):
+                start_m = months_map[start_name]
+                end_m = months_map[end_name]
+                if start_m <= end_m:
+                    found_months.update(range(start_m, end_m + 1))
 
             if not found_months:
                 continue
 
-            # Deduplicar e criar entradas
-            for m in sorted(set(found_months)):
+            # Criar entradas em ordem crescente
+            for m in sorted(found_months):
                 iso = f"{year}-{m:02d}-{day:02d}"
                 key = (it.get("descricao"), iso)
                 if key in seen:
@@ -53,23 +53,88 @@ def make_ics_from_dates(
         descricao = item.get("descricao")
         title = f"{titulo_base}" + (f" - {descricao}" if descricao else "")
         start, end = _to_all_day_range(_parse_date_iso(date_iso))
-        uid = str(uuid.uuid4())
         desc = (detalhes or "").replace("\n", "\\n")
-        vevent = [
-            "BEGIN:VEVENT",
-            f"UID:{uid}",
-            f"DTSTAMP:{now}",
-            f"SUMMARY:{title}",
-            f"DESCRIPTION:{desc}",
-            f"DTSTART;VALUE=DATE:{start}",
-            f"DTEND;VALUE=DATE:{end}",
-            "END:VEVENT",
-        ]
-        lines.extend(vevent)
+        # Um f-string por evento: um append e um objeto em vez de oito
+        # (uuid4().hex dispensa a formatação com hífens)
+        lines.append(
+            f"BEGIN:VEVENT\r\nUID:{uuid.uuid4().hex}\r\nDTSTAMP:{now}"
+            f"\r\nSUMMARY:{title}\r\nDESCRIPTION:{desc}"
+            f"\r\nDTSTART;VALUE=DATE:{start}\r\nDTEND;VALUE=DATE:{end}\r\nEND:VEVENT"
+        )
     lines.append("END:VCALENDAR")
     return "\r\n".join(lines)
 
 
+def build_calendar_artifacts(
+    datas_vencimento: List[Dict],
+    titulo_base: str = "Vencimento de contrato",
+    detalhes: str = "",
+    timezone: str = "America/Sao_Paulo",
+):
+    """Gera links Google/Outlook e o conteúdo ICS em uma única passada.
+
+    Equivale a chamar make_google_links_from_dates, make_outlook_links_from_dates
+    e make_ics_from_dates em sequência, mas itera a lista só uma vez e monta
+    título/datas por item uma única vez. Retorna (rows, ics_content), onde cada
+    row tem: descricao, date_iso, google, live, office.
+    """
+    now = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    ics_lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//AnalisadorContrato//PT-BR//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+    ]
+    rows = []
+    details_q = quote_plus(detalhes)
+    tz_q = quote_plus(timezone)
+    ics_desc = (detalhes or "").replace("\n", "\\n")
+
+    for item in datas_vencimento:
+        date_iso = item.get("data_iso")
+        if not date_iso:
+            # pular itens sem data
+            continue
+        descricao = item.get("descricao")
+        title = f"{titulo_base}" + (f" - {descricao}" if descricao else "")
+        date = _parse_date_iso(date_iso)
+        start, end = _to_all_day_range(date)
+        start_str = date.strftime("%Y-%m-%d")
+        end_str = (date + timedelta(days=1)).strftime("%Y-%m-%d")
+        title_q = quote_plus(title)
+
+        google = (
+            f"https://calendar.google.com/calendar/render?action=TEMPLATE&text={title_q}&dates={start}/{end}&details={details_q}"
+        )
+        live = (
+            "https://outlook.live.com/calendar/0/deeplink/compose?"
+            f"allday=true&subject={title_q}&body={details_q}&startdt={start_str}&enddt={end_str}&ctz={tz_q}"
+        )
+        office = (
+            "https://outlook.office.com/calendar/0/deeplink/compose?"
+            f"allday=true&subject={title_q}&body={details_q}&startdt={start_str}&enddt={end_str}&ctz={tz_q}"
+        )
+
+        # Mesmo formato de bloco único por evento usado em make_ics_from_dates
+        ics_lines.append(
+            f"BEGIN:VEVENT\r\nUID:{uuid.uuid4().hex}\r\nDTSTAMP:{now}"
+            f"\r\nSUMMARY:{title}\r\nDESCRIPTION:{ics_desc}"
+            f"\r\nDTSTART;VALUE=DATE:{start}\r\nDTEND;VALUE=DATE:{end}\r\nEND:VEVENT"
+        )
+
+        rows.append({
+            "descricao": descricao or date_iso,
+            "date_iso": date_iso,
+            "google": google,
+            "live": live,
+            "office": office,
+        })
+
+    ics_lines.append("END:VCALENDAR")
+    return rows, "\r\n".join(ics_lines)
+
+
 def make_outlook_links_from_dates(
     datas_vencimento: List[Dict],
     titulo_base: str = "Vencimento de contrato",
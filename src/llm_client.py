@@ -1,8 +1,12 @@
 from typing import List, Dict, Any, Optional
 
 from groq import Groq
+import asyncio
+import re
 import time
 
+import httpx
+
 # Gemini
 try:
     import google.generativeai as genai
@@ -10,7 +14,43 @@ except Exception:
     genai = None
 
 
+GROQ_CHAT_COMPLETIONS_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# Mensagens de rate limit da Groq informam a espera: "Please try again in 7.66s"
+_RETRY_AFTER_MSG_RE = re.compile(r"try again in ([0-9.]+)s")
+
+
+def _retry_after_seconds(msg: str, attempt: int, header_value: Optional[str] = None) -> float:
+    """Espera a aplicar após um rate limit.
+
+    Prioriza o header Retry-After (quando disponível), depois a espera
+    anunciada na própria mensagem de erro; só então cai no backoff fixo.
+    Esperar exatamente o que o servidor pede evita tanto dormir demais
+    quanto queimar uma tentativa cedo demais.
+    """
+    for candidate in (header_value, None):
+        if candidate:
+            try:
+                return min(float(candidate) + 0.5, 30.0)
+            except ValueError:
+                pass
+    m = _RETRY_AFTER_MSG_RE.search(msg)
+    if m:
+        try:
+            return min(float(m.group(1)) + 0.5, 30.0)
+        except ValueError:
+            pass
+    return 6.0 * (attempt + 1)
+
+
 class GroqLLM:
+    # Cliente assíncrono compartilhado para amortizar handshake TCP/TLS entre
+    # chamadas. Amarrado ao event loop que o criou: cada análise roda em um
+    # asyncio.run() próprio, e reutilizar conexões de um loop já encerrado
+    # falha com "Event loop is closed".
+    _async_client: Optional[httpx.AsyncClient] = None
+    _async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key
         self.client = Groq(api_key=api_key) if api_key else None
@@ -19,6 +59,21 @@ class GroqLLM:
         if not self.client:
             raise RuntimeError("GROQ API Key não configurada.")
 
+    @classmethod
+    def _get_async_client(cls) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if (
+            cls._async_client is None
+            or cls._async_client.is_closed
+            or cls._async_client_loop is not loop
+        ):
+            # Um cliente órfão de loop anterior não pode ser fechado aqui
+            # (aclose exigiria o loop antigo, já encerrado); soltar a
+            # referência deixa o GC liberar os sockets
+            cls._async_client = httpx.AsyncClient(timeout=httpx.Timeout(120.0))
+            cls._async_client_loop = loop
+        return cls._async_client
+
     def _map_deprecated_model(self, model: str) -> str:
         mapping = {
             "llama3-8b-8192": "llama-3.1-8b-instant",
@@ -42,6 +97,11 @@ class GroqLLM:
         response_mime_type: Optional[str] = None,
     ) -> str:
         self.ensure_client()
+        # JSON mode da Groq: garante saída JSON válida em uma única chamada,
+        # dispensando a segunda tentativa "estrita" do analisador
+        extra: Dict[str, Any] = {}
+        if response_mime_type == "application/json":
+            extra["response_format"] = {"type": "json_object"}
         # Retry/backoff básico para rate limit/TPM
         tries = 3
         model_to_use = model
@@ -52,6 +112,7 @@ class GroqLLM:
                     messages=messages,
                     temperature=temperature,
                     max_tokens=max_output_tokens,
+                    **extra,
                 )
                 return resp.choices[0].message.content
             except Exception as e:
@@ -66,8 +127,7 @@ class GroqLLM:
                 # Backoff em caso de rate limit/TPM
                 if ("rate_limit" in msg) and ("tokens per minute" in msg or "tpm" in msg):
                     if attempt < tries - 1:
-                        # espera incremental: 6s, 12s
-                        time.sleep(6 * (attempt + 1))
+                        time.sleep(_retry_after_seconds(msg, attempt))
                         continue
                 # Fallback em caso de limite diário (TPD): tentar modelo menor
                 if ("rate_limit" in msg) and ("tokens per day" in msg or "tpd" in msg):
@@ -79,6 +139,95 @@ class GroqLLM:
                 # Se não conseguimos tratar, repropaga
                 raise
 
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "llama3-8b-8192",
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+    ):
+        """Gera a resposta em streaming, emitindo deltas de texto.
+
+        Pensado para `st.write_stream`: o primeiro token chega em centenas de
+        milissegundos em vez de esperar a resposta inteira.
+        """
+        self.ensure_client()
+        model_to_use = self._map_deprecated_model(model)
+        response = self.client.chat.completions.create(
+            model=model_to_use,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_output_tokens,
+            stream=True,
+        )
+        for chunk in response:
+            try:
+                delta = chunk.choices[0].delta.content
+            except Exception:
+                delta = None
+            if delta:
+                yield delta
+
+    async def acomplete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "llama3-8b-8192",
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+        response_mime_type: Optional[str] = None,
+    ) -> str:
+        """Versão assíncrona de `complete` via endpoint OpenAI-compatível da Groq.
+
+        Permite disparar várias chamadas independentes em paralelo com
+        `asyncio.gather`, reutilizando um único AsyncClient para amortizar
+        o custo de conexão/TLS.
+        """
+        if not self.api_key:
+            raise RuntimeError("GROQ API Key não configurada.")
+        client = self._get_async_client()
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        # Mesmo retry/backoff e fallbacks da versão síncrona
+        tries = 3
+        model_to_use = model
+        for attempt in range(tries):
+            payload = {
+                "model": model_to_use,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_output_tokens,
+            }
+            if response_mime_type == "application/json":
+                payload["response_format"] = {"type": "json_object"}
+            resp = await client.post(GROQ_CHAT_COMPLETIONS_URL, headers=headers, json=payload)
+            if resp.status_code == 200:
+                data = resp.json()
+                return data["choices"][0]["message"]["content"]
+
+            msg = resp.text.lower()
+            # Se modelo foi desativado, troca para mapeado
+            if "decommissioned" in msg or "model_decommissioned" in msg:
+                upgraded = self._map_deprecated_model(model_to_use)
+                if upgraded != model_to_use:
+                    model_to_use = upgraded
+                    continue
+            # Backoff em caso de rate limit/TPM
+            if ("rate_limit" in msg) and ("tokens per minute" in msg or "tpm" in msg):
+                if attempt < tries - 1:
+                    wait = _retry_after_seconds(msg, attempt, resp.headers.get("retry-after"))
+                    await asyncio.sleep(wait)
+                    continue
+            # Fallback em caso de limite diário (TPD): tentar modelo menor
+            if ("rate_limit" in msg) and ("tokens per day" in msg or "tpd" in msg):
+                fallback = self._fallback_daily_limit_model(model_to_use)
+                if fallback != model_to_use:
+                    model_to_use = fallback
+                    continue
+            raise RuntimeError(f"Groq API error {resp.status_code}: {resp.text}")
+        raise RuntimeError("Groq API: tentativas esgotadas sem resposta.")
+
 
 class GeminiLLM:
     def __init__(self, api_key: Optional[str] = None):
@@ -86,6 +235,8 @@ class GeminiLLM:
         if genai and api_key:
             genai.configure(api_key=api_key)
         self._configured = bool(genai and api_key)
+        # Resultado de genai.list_models() memoizado (é uma chamada de rede)
+        self._models_cache = None
 
     def ensure_client(self):
         if not self._configured:
@@ -147,7 +298,12 @@ class GeminiLLM:
         # Lista candidatos e tenta filtrar por modelos realmente disponíveis
         cands = [model] + aliases.get(model, [])
         try:
-            models = list(genai.list_models())
+            # list_models() é uma chamada de rede: memoiza o resultado no
+            # cliente para que só a primeira completion pague a listagem
+            models = self._models_cache
+            if models is None:
+                models = list(genai.list_models())
+                self._models_cache = models
             names_full = [getattr(m, "name", "") for m in models]
             names_simplified = {n.split("/")[-1] for n in names_full if n}
             supported_full = [
@@ -165,6 +321,49 @@ class GeminiLLM:
         except Exception:
             return cands
 
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gemini-2.5-flash-lite",
+        temperature: float = 0.2,
+        max_output_tokens: int = 2000,
+    ):
+        """Versão streaming de `complete`, emitindo deltas de texto.
+
+        Tenta os mesmos modelos candidatos do fluxo síncrono; o primeiro que
+        produzir conteúdo encerra a iteração.
+        """
+        self.ensure_client()
+        prompt_parts = []
+        for m in messages:
+            role = m.get("role", "user").upper()
+            content = m.get("content", "")
+            prompt_parts.append(f"{role}: {content}")
+        prompt = "\n\n".join(prompt_parts)
+
+        last_error: Optional[Exception] = None
+        for model_to_use in self._candidate_models(model):
+            try:
+                model_obj = genai.GenerativeModel(model_to_use)
+                gen_cfg = {
+                    "temperature": float(max(0.0, min(1.0, temperature))),
+                    "max_output_tokens": int(max_output_tokens),
+                }
+                resp = model_obj.generate_content(prompt, generation_config=gen_cfg, stream=True)
+                emitted = False
+                for chunk in resp:
+                    t = getattr(chunk, "text", "") or ""
+                    if t:
+                        emitted = True
+                        yield t
+                if emitted:
+                    return
+            except Exception as e:
+                last_error = e
+                continue
+        if last_error:
+            raise last_error
+
     def complete(
         self,
         messages: List[Dict[str, str]],
@@ -23,20 +23,49 @@ STANDARD_CLAUSES = [
 ]
 
 
+# Descrição do schema e regras compartilhadas entre o prompt de trecho único
+# e o prompt em lote (vários trechos em uma chamada)
+_EXTRACTION_SCHEMA_SPEC = (
+    "'datas_vencimento' (lista de objetos: descricao, data_iso, texto_origem), "
+    "'valores_multas' (lista: tipo, valor_monetario, moeda, percentual, condicao, texto_origem), "
+    "'partes' (lista: nome, tipo(pessoa física/jurídica), papel, documentos, texto_origem), "
+    "'clausulas_comprometedoras' (lista: titulo, risco(descricao), parte_afetada, gravidade(baixo/médio/alto), texto_origem), "
+    "'clausulas_padrao' (lista: tipo, presente(true/false), desvio, texto_origem), "
+    "'analise_risco' (objeto: risco_geral_nota(1-5), top_riscos(lista de strings)). "
+    "'resumo_juridico' (string: resuma cláusulas com títulos e riscos associados; se não houver risco, apenas resuma). "
+)
+
+_EXTRACTION_RULES = (
+    "REGRAS: Não calcule nem estime valores (por exemplo, não derive o valor da parcela dividindo o total). "
+    "Registre apenas números que aparecem literalmente no contrato. Se não houver número explícito, use null. "
+    "IMPORTANTE: Responda SOMENTE com JSON válido."
+)
+
+
 def build_extraction_user_prompt(contract_text: str) -> str:
     return (
         "Leia o contrato a seguir e produza um objeto JSON COM AS CHAVES EXATAS: "
-        "'datas_vencimento' (lista de objetos: descricao, data_iso, texto_origem), "
-        "'valores_multas' (lista: tipo, valor_monetario, moeda, percentual, condicao, texto_origem), "
-        "'partes' (lista: nome, tipo(pessoa física/jurídica), papel, documentos, texto_origem), "
-        "'clausulas_comprometedoras' (lista: titulo, risco(descricao), parte_afetada, gravidade(baixo/médio/alto), texto_origem), "
-        "'clausulas_padrao' (lista: tipo, presente(true/false), desvio, texto_origem), "
-        "'analise_risco' (objeto: risco_geral_nota(1-5), top_riscos(lista de strings)). "
-        "'resumo_juridico' (string: resuma cláusulas com títulos e riscos associados; se não houver risco, apenas resuma). "
-        "REGRAS: Não calcule nem estime valores (por exemplo, não derive o valor da parcela dividindo o total). "
-        "Registre apenas números que aparecem literalmente no contrato. Se não houver número explícito, use null. "
-        "IMPORTANTE: Responda SOMENTE com JSON válido.\n\n"
-        f"Contrato:\n{contract_text}"
+        + _EXTRACTION_SCHEMA_SPEC
+        + _EXTRACTION_RULES
+        + f"\n\nContrato:\n{contract_text}"
+    )
+
+
+def build_batch_extraction_user_prompt(chunks) -> str:
+    """Prompt de extração para vários trechos em uma única chamada.
+
+    O modelo deve devolver {'resultados': [...]} com um objeto por trecho,
+    na mesma ordem — o chamador valida o tamanho e recai em chamadas
+    individuais se a resposta não casar.
+    """
+    numbered = "\n\n".join(f"### TRECHO {i + 1}\n{c}" for i, c in enumerate(chunks))
+    return (
+        "Leia os trechos de contrato a seguir e produza um objeto JSON com a chave "
+        "'resultados': uma lista com EXATAMENTE um objeto por trecho, NA MESMA ORDEM dos trechos. "
+        "Cada objeto deve ter AS CHAVES EXATAS: "
+        + _EXTRACTION_SCHEMA_SPEC
+        + _EXTRACTION_RULES
+        + f"\n\n{numbered}"
     )
 
 
@@ -1,8 +1,27 @@
-from typing import List
+import hashlib
+import pickle
+import re
 
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from rank_bm25 import BM25Okapi
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import linear_kernel
 
+# Diretório do cache em disco dos índices por contrato (warm-start entre sessões)
+INDEX_CACHE_DIR = Path(".rag_cache")
+
+# Constante k do Reciprocal Rank Fusion (valor usual na literatura)
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
 
 def _chunk_text(text: str, max_chars: int = 1200) -> List[str]:
     # Divide o texto em blocos de ~max_chars, respeitando quebras simples
@@ -25,15 +44,160 @@ def _chunk_text(text: str, max_chars: int = 1200) -> List[str]:
     return chunks
 
 
-def retrieve_relevant_chunks(question: str, text: str, top_k: int = 5) -> List[str]:
-    chunks = _chunk_text(text, max_chars=1400)
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?;])\s+")
+
+# Percentil da distância entre sentenças adjacentes usado como limiar de quebra
+SEMANTIC_BREAK_PERCENTILE = 95
+
+
+def _split_sentences(text: str) -> List[str]:
+    return [p.strip() for p in _SENTENCE_SPLIT_RE.split(text) if p.strip()]
+
+
+def _semantic_chunk_text(text: str, max_chars: int = 1400) -> List[str]:
+    """Agrupa sentenças contíguas por similaridade em vez de janela fixa.
+
+    Quebra o texto onde a distância de cosseno entre sentenças adjacentes
+    excede o percentil 95 (ou onde o chunk estouraria max_chars), de modo que
+    cláusulas inteiras tendem a cair no mesmo chunk. Com poucas sentenças, ou
+    em caso de falha, recai na divisão por janela fixa.
+    """
+    sentences = _split_sentences(text)
+    if len(sentences) < 8:
+        return _chunk_text(text, max_chars=max_chars)
+    try:
+        vec = TfidfVectorizer(dtype=np.float32)
+        mat = vec.fit_transform(sentences)
+        # Cosseno entre sentenças adjacentes: linhas já normalizadas em L2
+        adjacent_sims = np.asarray(mat[:-1].multiply(mat[1:]).sum(axis=1)).ravel()
+        distances = 1.0 - adjacent_sims
+        threshold = np.percentile(distances, SEMANTIC_BREAK_PERCENTILE)
+
+        chunks: List[str] = []
+        buf = [sentences[0]]
+        buf_len = len(sentences[0])
+        for i in range(1, len(sentences)):
+            s = sentences[i]
+            if distances[i - 1] > threshold or buf_len + len(s) + 1 > max_chars:
+                chunks.append(" ".join(buf))
+                buf = []
+                buf_len = 0
+            buf.append(s)
+            buf_len += len(s) + 1
+        if buf:
+            chunks.append(" ".join(buf))
+        return chunks
+    except Exception:
+        return _chunk_text(text, max_chars=max_chars)
+
+
+def _text_fingerprint(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _load_cached_index(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        if path.exists():
+            with open(path, "rb") as f:
+                index = pickle.load(f)
+            # Índices antigos (sem BM25) são descartados e reconstruídos
+            if isinstance(index, dict) and "bm25" in index:
+                return index
+    except Exception:
+        # Cache corrompido ou incompatível: ignora e reconstrói
+        pass
+    return None
+
+
+def _store_cached_index(path: Path, index: Dict[str, Any]) -> None:
+    try:
+        INDEX_CACHE_DIR.mkdir(exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(index, f)
+    except Exception:
+        # Falha ao persistir não deve quebrar a busca
+        pass
+
+
+def build_index(text: str, use_disk_cache: bool = True) -> Optional[Dict[str, Any]]:
+    """Constrói o índice TF-IDF do contrato uma única vez.
+
+    Separa a etapa cara (chunking + fit da matriz TF-IDF) da busca, para que
+    o índice possa ser cacheado por contrato e reutilizado entre perguntas.
+    Com `use_disk_cache`, o índice pronto também é persistido em
+    `.rag_cache/<hash>.pkl`, então sessões futuras com o mesmo contrato
+    partem direto do disco sem refazer chunking nem fit.
+    """
+    cache_path = None
+    if use_disk_cache:
+        cache_path = INDEX_CACHE_DIR / f"{_text_fingerprint(text)}.pkl"
+        cached = _load_cached_index(cache_path)
+        if cached is not None:
+            return cached
+
+    chunks = _semantic_chunk_text(text, max_chars=1400)
     if not chunks:
+        return None
+    # float32 halveia a memória/banda da matriz sem mudar o ranking na prática
+    vectorizer = TfidfVectorizer(dtype=np.float32)
+    doc_vectors = vectorizer.fit_transform(chunks)
+    # Índice lexical BM25 em paralelo ao TF-IDF: consultas com termos exatos
+    # (números de cláusula, nomes de partes) não dependem só do cosseno
+    bm25 = BM25Okapi([_tokenize(c) for c in chunks])
+    index = {"chunks": chunks, "vectorizer": vectorizer, "doc_vectors": doc_vectors, "bm25": bm25}
+
+    if cache_path is not None:
+        _store_cached_index(cache_path, index)
+    return index
+
+
+def _top_k_desc(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Índices dos top_k maiores scores, em ordem decrescente."""
+    if top_k >= scores.size:
+        return np.argsort(scores)[::-1]
+    # argpartition seleciona os top_k em O(N); só eles são ordenados depois
+    part = np.argpartition(scores, -top_k)[-top_k:]
+    return part[np.argsort(scores[part])[::-1]]
+
+
+def search(index: Optional[Dict[str, Any]], question: str, top_k: int = 5) -> List[str]:
+    """Busca híbrida (TF-IDF + BM25) com fusão por Reciprocal Rank Fusion."""
+    if not index:
         return []
-    corpus = chunks + [question]
-    vec = TfidfVectorizer()
-    tfidf = vec.fit_transform(corpus)
-    question_vec = tfidf[-1]
-    doc_vectors = tfidf[:-1]
-    sims = linear_kernel(question_vec, doc_vectors).flatten()
-    top_idx = sims.argsort()[::-1][:top_k]
-    return [chunks[i] for i in top_idx]
\ No newline at end of file
+    question_vec = index["vectorizer"].transform([question])
+    sims = linear_kernel(question_vec, index["doc_vectors"]).flatten()
+
+    bm25 = index.get("bm25")
+    if bm25 is None:
+        top_idx = _top_k_desc(sims, top_k)
+        return [index["chunks"][i] for i in top_idx]
+
+    bm25_scores = np.asarray(bm25.get_scores(_tokenize(question)))
+
+    # RRF: score = soma de 1/(k + posição) em cada ranking
+    rrf = np.zeros(sims.size)
+    for ranking in (np.argsort(sims)[::-1], np.argsort(bm25_scores)[::-1]):
+        rrf[ranking] += 1.0 / (RRF_K + np.arange(1, sims.size + 1))
+
+    top_idx = _top_k_desc(rrf, top_k)
+    return [index["chunks"][i] for i in top_idx]
+
+
+def query_vector(index: Optional[Dict[str, Any]], question: str):
+    """Vetoriza uma pergunta no espaço TF-IDF do índice (ex.: para cache semântico)."""
+    if not index:
+        return None
+    return index["vectorizer"].transform([question])
+
+
+def query_cosine(vec_a, vec_b) -> float:
+    """Similaridade de cosseno entre dois vetores de pergunta.
+
+    O TfidfVectorizer normaliza em L2 por padrão, então o produto interno
+    (linear_kernel) já é o cosseno.
+    """
+    return float(linear_kernel(vec_a, vec_b)[0][0])
+
+
+def retrieve_relevant_chunks(question: str, text: str, top_k: int = 5) -> List[str]:
+    return search(build_index(text), question, top_k=top_k)
\ No newline at end of file
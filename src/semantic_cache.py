@@ -0,0 +1,103 @@
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional
+
+from .rag import query_cosine
+
+# Cache persistente de respostas de IA (exato + semântico)
+CACHE_DB_PATH = Path(".qa_cache") / "cache.sqlite"
+MAX_ENTRIES = 500
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+class SemanticCache:
+    """Cache de respostas com duas camadas: hash exato e similaridade semântica.
+
+    Cada entrada pertence a um namespace (tipicamente o hash do contrato —
+    vetores TF-IDF de contratos diferentes não são comparáveis entre si) e
+    guarda a chave exata, o vetor da pergunta (opcional) e a resposta.
+    O lookup tenta primeiro a chave exata; se houver vetor, compara por
+    cosseno contra as entradas do mesmo namespace. Entradas expiram por TTL
+    e o total é limitado por evicção LRU.
+    """
+
+    def __init__(
+        self,
+        path: Path = CACHE_DB_PATH,
+        max_entries: int = MAX_ENTRIES,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        path.parent.mkdir(exist_ok=True)
+        # check_same_thread=False: o Streamlit pode reexecutar em threads diferentes
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " vec BLOB,"
+            " answer TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+
+    def get(self, namespace: str, key: str, q_vec=None, threshold: float = 0.95) -> Optional[str]:
+        """Busca uma resposta: primeiro por chave exata, depois por similaridade."""
+        now = time.time()
+        self._conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,))
+
+        row = self._conn.execute(
+            "SELECT answer FROM entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row:
+            self._touch(namespace, key, now)
+            return row[0]
+
+        if q_vec is not None:
+            for cand_key, vec_blob, answer in self._conn.execute(
+                "SELECT key, vec, answer FROM entries WHERE namespace = ? AND vec IS NOT NULL",
+                (namespace,),
+            ):
+                try:
+                    cached_vec = pickle.loads(vec_blob)
+                    if query_cosine(q_vec, cached_vec) >= threshold:
+                        self._touch(namespace, cand_key, now)
+                        return answer
+                except Exception:
+                    continue
+        return None
+
+    def put(self, namespace: str, key: str, answer: str, q_vec=None) -> None:
+        now = time.time()
+        vec_blob = pickle.dumps(q_vec) if q_vec is not None else None
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, vec, answer, created, last_used)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, key, vec_blob, answer, now, now),
+        )
+        self._evict()
+        self._conn.commit()
+
+    def _touch(self, namespace: str, key: str, now: float) -> None:
+        self._conn.execute(
+            "UPDATE entries SET last_used = ? WHERE namespace = ? AND key = ?",
+            (now, namespace, key),
+        )
+        self._conn.commit()
+
+    def _evict(self) -> None:
+        # Evicção LRU: mantém no máximo max_entries no banco
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE rowid IN ("
+                " SELECT rowid FROM entries ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
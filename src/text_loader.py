@@ -1,11 +1,52 @@
 import io
+import os
 from typing import Optional
 
 from pypdf import PdfReader
 from docx import Document
 
+# pypdfium2: parser C bem mais rápido que pypdf; se ausente, caímos no pypdf
+try:
+    import pypdfium2 as pdfium
+except Exception:
+    pdfium = None
+
+SUPPORTED_EXTENSIONS = frozenset({".pdf", ".docx"})
+_SUPPORTED_MSG = ", ".join(sorted(e.lstrip(".").upper() for e in SUPPORTED_EXTENSIONS))
+
+
+def _extract_text_pdfium(file_bytes: bytes) -> str:
+    """Extrai texto via pdfium, página a página.
+
+    Sequencial de propósito: a pdfium não é thread-safe (chamadas concorrentes
+    podem corromper memória e derrubar o processo inteiro, sem exceção
+    capturável). O ganho sobre o pypdf vem do parser em C, não de paralelismo.
+    """
+    doc = pdfium.PdfDocument(io.BytesIO(file_bytes))
+    try:
+        texts = []
+        for i in range(len(doc)):
+            try:
+                t = doc[i].get_textpage().get_text_range() or ""
+            except Exception:
+                t = ""
+            if t:
+                texts.append(t)
+        return "\n\n".join(texts).strip()
+    finally:
+        try:
+            doc.close()
+        except Exception:
+            pass
+
 
 def extract_text_from_pdf(file_bytes: bytes) -> str:
+    if pdfium is not None:
+        try:
+            return _extract_text_pdfium(file_bytes)
+        except Exception:
+            # PDF problemático para o pdfium: tenta o pypdf abaixo
+            pass
     reader = PdfReader(io.BytesIO(file_bytes))
     texts = []
     for page in reader.pages:
@@ -30,9 +71,12 @@ def extract_text_from_docx(file_bytes: bytes) -> str:
 
 def extract_text(uploaded_file) -> str:
     name = uploaded_file.name.lower()
+    ext = os.path.splitext(name)[1]
+    # Checa a extensão antes de getvalue(): rejeitar formato inválido não
+    # precisa materializar o arquivo inteiro em memória
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Formato não suportado. Envie {_SUPPORTED_MSG}.")
     data = uploaded_file.getvalue()
-    if name.endswith(".pdf"):
+    if ext == ".pdf":
         return extract_text_from_pdf(data)
-    if name.endswith(".docx"):
-        return extract_text_from_docx(data)
-    raise ValueError("Formato não suportado. Envie PDF ou DOCX.")
\ No newline at end of file
+    return extract_text_from_docx(data)